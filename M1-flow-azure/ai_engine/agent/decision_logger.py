@@ -3,8 +3,9 @@ Decision Logger - Stores agent decisions for audit and analysis
 """
 import json
 import logging
-from datetime import datetime
-from typing import Dict, Any
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
 from shared.storage_client import storage_client
 from config.settings import settings
 
@@ -16,6 +17,8 @@ class DecisionLogger:
     def __init__(self):
         self.table_client = storage_client.get_table_client(settings.TABLE_NAME_AI_DECISIONS)
         self.blob_client = None  # Will init when needed
+        self._last_decisions: Dict[str, Dict] = {}  # stadium_id -> last logged decision entity
+        self._lock = threading.Lock()
     
     def log_decision(self, decision: Dict[str, Any], stadium_id: str) -> str:
         """
@@ -49,13 +52,22 @@ class DecisionLogger:
                 "cost_usd": metadata.get("total_cost_usd", 0.0),
                 "model": metadata.get("model", "unknown"),
                 "timestamp": timestamp,
-                "fallback": decision.get("fallback", False)
+                "fallback": decision.get("fallback", False),
+                
+                # Change detection: a reused decision keeps the time of the original one
+                "state_fingerprint": metadata.get("state_fingerprint", ""),
+                "no_change": decision.get("no_change", False),
+                "reused_decision_id": decision.get("reused_decision_id", ""),
+                "decided_at": decision.get("decided_at") or timestamp
             }
             
             # Store in Table Storage
             self.table_client.upsert_entity(entity)
             logger.info(f"Logged decision {decision_id} to Table Storage")
             
+            with self._lock:
+                self._last_decisions[stadium_id] = entity
+            
             # Store detailed trace in Blob Storage (for full audit trail)
             self._store_blob_trace(decision_id, decision, stadium_id)
             
@@ -68,21 +80,11 @@ class DecisionLogger:
     def _store_blob_trace(self, decision_id: str, decision: Dict, stadium_id: str):
         """Store full decision trace as JSON in Blob Storage"""
         try:
-            # Initialize blob client if needed
+            # Initialize blob client if needed (pooled, container created once per process)
             if not self.blob_client:
-                from azure.storage.blob import BlobServiceClient
-                blob_service = BlobServiceClient.from_connection_string(
-                    settings.STORAGE_CONNECTION_STRING
+                self.blob_client = storage_client.get_container_client(
+                    settings.BLOB_CONTAINER_DECISION_TRACES
                 )
-                container_name = settings.BLOB_CONTAINER_DECISION_TRACES
-                
-                # Create container if it doesn't exist
-                try:
-                    blob_service.create_container(container_name)
-                except Exception:
-                    pass  # Container already exists
-                
-                self.blob_client = blob_service.get_container_client(container_name)
             
             # Prepare blob data
             blob_data = {
@@ -93,7 +95,7 @@ class DecisionLogger:
             }
             
             blob_name = f"{stadium_id}/{decision_id}.json"
-            blob_json = json.dumps(blob_data, indent=2)
+            blob_json = json.dumps(blob_data, indent=2, default=str)
             
             # Upload to blob
             self.blob_client.upload_blob(
@@ -107,6 +109,36 @@ class DecisionLogger:
         except Exception as e:
             logger.warning(f"Failed to store blob trace: {str(e)}")
     
+    def get_last_decision(self, stadium_id: str, max_age_minutes: int) -> Optional[Dict]:
+        """
+        Latest decision entity of a stadium whose original decision is newer than max_age_minutes
+        
+        Returns:
+            Entity dict, or None if there is none (or it is too old to reuse)
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=max_age_minutes)
+        
+        with self._lock:
+            last = self._last_decisions.get(stadium_id)
+        
+        if last is None:
+            # Cold worker: only decisions logged inside the reuse window can qualify
+            try:
+                entities = list(self.table_client.query_entities(
+                    f"PartitionKey eq '{stadium_id}' and timestamp ge datetime'{cutoff.strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+                ))
+            except Exception as e:
+                logger.warning(f"Failed to load last decision: {str(e)}")
+                return None
+            if not entities:
+                return None
+            last = max(entities, key=lambda x: x["timestamp"])
+        
+        decided_at = last.get("decided_at") or last.get("timestamp")
+        if decided_at.tzinfo is None:
+            decided_at = decided_at.replace(tzinfo=timezone.utc)
+        return last if decided_at >= cutoff else None
+    
     def get_recent_decisions(self, stadium_id: str, limit: int = 10) -> list:
         """Get recent decisions for a stadium"""
         try:
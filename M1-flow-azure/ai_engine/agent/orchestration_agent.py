@@ -4,6 +4,7 @@ Uses OpenAI GPT with function calling to make intelligent crowd management decis
 """
 import json
 import logging
+import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from shared.openai_client import openai_client
@@ -48,10 +49,14 @@ class OrchestrationAgent:
             logger.warning(f"System prompt file not found: {prompt_path}, using default")
             return "You are an AI assistant for stadium crowd management."
     
-    def make_decision(self) -> Dict[str, Any]:
+    def make_decision(self, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         Main decision loop: Observe → Reason → Act
         
+        Args:
+            deadline: time.monotonic() value after which no further LLM call is
+                started; the rule-based fallback decision is returned instead
+        
         Returns:
             Decision dict with recommendation, reasoning, confidence
         """
@@ -66,6 +71,10 @@ class OrchestrationAgent:
         
         try:
             while iteration < self.max_iterations:
+                if deadline is not None and time.monotonic() >= deadline:
+                    logger.warning(f"Agent for {self.stadium_id} ran out of time after {iteration} iterations")
+                    return self._fallback_decision()
+                
                 iteration += 1
                 logger.info(f"Agent iteration {iteration}/{self.max_iterations}")
                 
@@ -74,7 +83,8 @@ class OrchestrationAgent:
                     messages=messages,
                     functions=self.functions,
                     temperature=0.7,
-                    max_tokens=settings.OPENAI_MAX_TOKENS
+                    max_tokens=settings.OPENAI_MAX_TOKENS,
+                    cache=False  # Conversation carries live function results
                 )
                 
                 total_cost += response["cost"]
@@ -0,0 +1,34 @@
+"""
+State Fingerprint - Hash of a stadium's quantised gate state
+Two runs with the same fingerprint would show the agent the same situation
+"""
+import hashlib
+import json
+from shared.stadium_snapshot import stadium_snapshots
+from config.settings import settings
+
+
+def compute_state_fingerprint(stadium_id: str) -> str:
+    """
+    Fingerprint the current gate states of a stadium
+    
+    Args:
+        stadium_id: Stadium identifier
+    
+    Returns:
+        Hex digest over (gate, state, queue length bucket, wait band) of every gate
+    """
+    snapshot = stadium_snapshots.get(stadium_id)
+    gates = snapshot.gates_since() if snapshot else []
+    
+    quantised = [
+        [
+            gate["gateId"],
+            gate.get("state") or "green",
+            int((gate.get("queueLength") or 0) // settings.AGENT_FINGERPRINT_QUEUE_BUCKET),
+            int((gate.get("wait") or 0) // settings.AGENT_FINGERPRINT_WAIT_BAND)
+        ]
+        for gate in gates
+    ]
+    
+    return hashlib.sha1(json.dumps(quantised).encode()).hexdigest()
@@ -4,12 +4,16 @@ Coordinates hypothesis generation, testing, and mitigation recommendations
 """
 import logging
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, List
 from ai_engine.root_cause.hypothesis_generator import hypothesis_generator
 from ai_engine.root_cause.hypothesis_tester import hypothesis_tester
 from ai_engine.root_cause.mitigation_recommender import mitigation_recommender
 from shared.storage_client import storage_client
+from shared.ttl_cache import TTLCache
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -18,47 +22,128 @@ class AnomalyInvestigator:
     """Main RCA orchestrator - runs full investigation pipeline"""
     
     def __init__(self):
-        self.investigation_cache = {}  # Simple in-memory cache
+        # LRU + TTL, bounded by entry count and estimated report size
+        self.investigation_cache = TTLCache(
+            settings.RCA_INVESTIGATION_CACHE_MAX_ENTRIES,
+            900,
+            max_bytes=settings.RCA_INVESTIGATION_CACHE_MAX_BYTES,
+            sizeof=lambda report: len(json.dumps(report, default=str))
+        )
+        self._in_flight: Dict[tuple, tuple] = {}  # (stadium, gate, score bucket) -> (investigation_id, Future)
+        self._in_flight_lock = threading.Lock()
+        self.coalesced = 0
+        self._plan_pool = ThreadPoolExecutor(max_workers=settings.RCA_PLAN_MAX_WORKERS, thread_name_prefix="rca-plan")
+        self.prebuilt_plans_used = 0
+        self.prebuilt_plans_rebuilt = 0
+        self.prebuilt_plans_not_started = 0
     
-    def investigate(self, anomaly_data: Dict[str, Any], cache_ttl_seconds: int = 900) -> Dict[str, Any]:
+    def investigate(self, anomaly_data: Dict[str, Any], cache_ttl_seconds: int = 900, investigation_id: str = None) -> Dict[str, Any]:
         """
         Run full RCA investigation
         
+        Only one investigation per (stadium, gate, score bucket) runs at a time;
+        concurrent callers with the same key share its result instead of starting another.
+        
         Args:
             anomaly_data: Dict with gate_id, anomaly_score, queue_length, etc.
             cache_ttl_seconds: Cache TTL (default 15 minutes)
+            investigation_id: ID of a queued investigation to complete (generated if None)
         
         Returns:
             Investigation report with hypotheses, evidence, diagnosis, mitigation plan
         """
         # Check cache
-        cache_key = f"{anomaly_data.get('gate_id')}_{anomaly_data.get('anomaly_score')}"
-        cached = self._get_cached(cache_key, cache_ttl_seconds)
+        cache_key = (
+            anomaly_data.get("stadium_id"),
+            anomaly_data.get("gate_id"),
+            int((anomaly_data.get("anomaly_score") or 0) // settings.RCA_INVESTIGATION_SCORE_BUCKET)
+        )
+        cached = self.investigation_cache.get(cache_key)
         if cached:
             logger.info(f"Returning cached investigation for {cache_key}")
-            return cached
+            return self._complete_job(cached, investigation_id)
         
-        logger.info(f"Starting RCA investigation for {anomaly_data.get('gate_id')}")
+        # Single flight: join a running investigation of the same gate and score bucket
+        flight_key = cache_key
+        with self._in_flight_lock:
+            in_flight = self._in_flight.get(flight_key)
+            if in_flight is None:
+                investigation_id = investigation_id or f"INV_{anomaly_data.get('gate_id')}_{int(datetime.utcnow().timestamp())}"
+                future = Future()
+                self._in_flight[flight_key] = (investigation_id, future)
+            else:
+                self.coalesced += 1
         
-        investigation_id = f"INV_{anomaly_data.get('gate_id')}_{int(datetime.utcnow().timestamp())}"
+        if in_flight is not None:
+            leader_id, leader_future = in_flight
+            logger.info(f"Investigation {leader_id} already running for {flight_key[1]}, joining it")
+            return self._complete_job(leader_future.result(), investigation_id)
+        
+        try:
+            report = self._run_pipeline(anomaly_data, investigation_id, cache_key, cache_ttl_seconds)
+            future.set_result(report)
+            return report
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(flight_key, None)
+    
+    def _complete_job(self, report: Dict, investigation_id: str = None) -> Dict:
+        """Store a shared report under a queued investigation's own ID"""
+        if investigation_id and investigation_id != report.get("investigation_id"):
+            report = {**report, "investigation_id": investigation_id}
+            if report.get("status") == "completed":
+                self._store_investigation(report)
+        return report
+    
+    def _run_pipeline(self, anomaly_data: Dict[str, Any], investigation_id: str, cache_key: tuple,
+                      cache_ttl_seconds: int) -> Dict[str, Any]:
+        """
+        Generate, test and rank hypotheses, then pick the mitigation plan
+        
+        Plans for the RCA_PREBUILD_PLANS most plausible hypotheses are built
+        while the tests run. If one of them wins, its plan is used unless the
+        final confidence differs from the prior it was built with by more than
+        RCA_PLAN_CONFIDENCE_TOLERANCE, in which case the plan is rebuilt. A
+        prebuild that has not started by then is cancelled and built inline.
+        """
+        logger.info(f"Starting RCA investigation for {anomaly_data.get('gate_id')}")
         
         start_time = datetime.utcnow()
+        stage_timings = {}
+        prebuilt = {}  # hypothesis name -> (plan future, confidence it was built with)
         
         try:
             # Step 1: Generate hypotheses
             logger.info("Step 1: Generating hypotheses")
+            stage_start = time.perf_counter()
             hypotheses = hypothesis_generator.generate_hypotheses(anomaly_data)
+            stage_timings["generate"] = self._elapsed_ms(stage_start)
             
             if not hypotheses:
                 return self._error_report("Failed to generate hypotheses", investigation_id)
             
-            # Step 2: Test hypotheses
+            # Start mitigation plans for the leading hypotheses (by prior plausibility)
+            leaders = sorted(hypotheses, key=lambda h: h.get("plausibility", 0.5), reverse=True)
+            for hypothesis in leaders[:settings.RCA_PREBUILD_PLANS]:
+                name = hypothesis.get("name")
+                if name and name not in prebuilt:
+                    prior = hypothesis.get("plausibility", 0.5)
+                    prebuilt[name] = (self._plan_pool.submit(self._timed_recommend, name, anomaly_data, prior), prior)
+            
+            # Step 2: Test hypotheses (plans are being built meanwhile)
             logger.info("Step 2: Testing hypotheses")
+            stage_start = time.perf_counter()
             tested_hypotheses = hypothesis_tester.test_hypotheses(hypotheses, anomaly_data)
+            stage_timings["test"] = self._elapsed_ms(stage_start)
             
             # Step 3: Rank hypotheses by evidence
             logger.info("Step 3: Ranking hypotheses")
+            stage_start = time.perf_counter()
             ranked = self._rank_hypotheses(tested_hypotheses)
+            stage_timings["rank"] = self._elapsed_ms(stage_start)
             
             # Step 4: Diagnose most likely cause
             diagnosis = ranked[0] if ranked else None
@@ -66,13 +151,33 @@ class AnomalyInvestigator:
             if not diagnosis:
                 return self._error_report("No viable diagnosis", investigation_id)
             
-            # Step 5: Generate mitigation plan
+            # Step 5: Pick the pre-built plan of the winner, or build one now
             logger.info("Step 4: Generating mitigation plan")
-            mitigation_plan = mitigation_recommender.recommend(
-                diagnosis["name"],
-                anomaly_data,
-                diagnosis.get("final_confidence", 0.5)
-            )
+            stage_start = time.perf_counter()
+            final_confidence = diagnosis.get("final_confidence", 0.5)
+            winner_plan = prebuilt.pop(diagnosis["name"], None)
+            if winner_plan is not None and winner_plan[0].cancel():
+                # Still queued behind other investigations' prebuilds: build it inline instead
+                winner_plan = None
+                self.prebuilt_plans_not_started += 1
+            elif winner_plan is not None and abs(winner_plan[1] - final_confidence) > settings.RCA_PLAN_CONFIDENCE_TOLERANCE:
+                # Built for a confidence the tests no longer support
+                winner_plan[0].cancel()
+                winner_plan = None
+                self.prebuilt_plans_rebuilt += 1
+            
+            if winner_plan is not None:
+                mitigation_plan, stage_timings["plan_build"] = winner_plan[0].result()
+                stage_timings["plan_prebuilt"] = True
+                self.prebuilt_plans_used += 1
+            else:
+                mitigation_plan, stage_timings["plan_build"] = self._timed_recommend(
+                    diagnosis["name"],
+                    anomaly_data,
+                    final_confidence
+                )
+                stage_timings["plan_prebuilt"] = False
+            stage_timings["plan_wait"] = self._elapsed_ms(stage_start)
             
             # Calculate execution time
             execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
@@ -94,14 +199,15 @@ class AnomalyInvestigator:
                 "all_hypotheses": tested_hypotheses,
                 "mitigation_plan": mitigation_plan,
                 "status": "completed",
-                "execution_time_ms": int(execution_time)
+                "execution_time_ms": int(execution_time),
+                "stage_timings_ms": stage_timings
             }
             
             # Store investigation
             self._store_investigation(report)
             
             # Cache result
-            self._cache_result(cache_key, report)
+            self.investigation_cache.set(cache_key, report, ttl_seconds=cache_ttl_seconds)
             
             logger.info(f"Investigation {investigation_id} completed: {diagnosis['name']} in {execution_time:.0f}ms")
             
@@ -110,6 +216,21 @@ class AnomalyInvestigator:
         except Exception as e:
             logger.error(f"Investigation failed: {str(e)}")
             return self._error_report(str(e), investigation_id)
+        
+        finally:
+            # Plans for losing hypotheses are not needed any more
+            for future, _ in prebuilt.values():
+                future.cancel()
+    
+    def _timed_recommend(self, diagnosis: str, anomaly_data: Dict[str, Any], confidence: float) -> tuple:
+        """Build a mitigation plan; returns (plan, elapsed ms)"""
+        stage_start = time.perf_counter()
+        plan = mitigation_recommender.recommend(diagnosis, anomaly_data, confidence)
+        return plan, self._elapsed_ms(stage_start)
+    
+    @staticmethod
+    def _elapsed_ms(stage_start: float) -> int:
+        return int((time.perf_counter() - stage_start) * 1000)
     
     def _rank_hypotheses(self, tested_hypotheses: List[Dict]) -> List[Dict]:
         """Rank hypotheses by combining plausibility and test evidence"""
@@ -162,7 +283,8 @@ class AnomalyInvestigator:
                     "hypotheses_tested": report.get("hypotheses_tested", 0),
                     "confidence": report["diagnosis"]["confidence"]
                 }),
-                "execution_time_ms": report.get("execution_time_ms", 0)
+                "execution_time_ms": report.get("execution_time_ms", 0),
+                "stage_timings_ms": json.dumps(report.get("stage_timings_ms", {}))
             }
             
             table_client.upsert_entity(entity)
@@ -171,18 +293,15 @@ class AnomalyInvestigator:
         except Exception as e:
             logger.warning(f"Failed to store investigation: {str(e)}")
     
-    def _get_cached(self, key: str, ttl: int) -> Dict | None:
-        """Get cached result if still valid"""
-        if key in self.investigation_cache:
-            cached_time, result = self.investigation_cache[key]
-            age = (datetime.utcnow() - cached_time).total_seconds()
-            if age < ttl:
-                return result
-        return None
-    
-    def _cache_result(self, key: str, result: Dict):
-        """Cache investigation result"""
-        self.investigation_cache[key] = (datetime.utcnow(), result)
+    def get_stats(self) -> Dict[str, Any]:
+        """Single-flight, test timeout and report cache counters"""
+        with self._in_flight_lock:
+            stats = {"in_flight": len(self._in_flight), "coalesced": self.coalesced,
+                     "prebuilt_plans_used": self.prebuilt_plans_used,
+                     "prebuilt_plans_rebuilt": self.prebuilt_plans_rebuilt,
+                     "prebuilt_plans_not_started": self.prebuilt_plans_not_started}
+        stats["tests_timed_out"] = hypothesis_tester.timed_out
+        return {**stats, "cache": self.investigation_cache.get_stats()}
     
     def _error_report(self, error: str, investigation_id: str) -> Dict:
         """Generate error report"""
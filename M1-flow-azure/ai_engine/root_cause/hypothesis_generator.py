@@ -1,15 +1,23 @@
 """
 Hypothesis Generator - Creates potential root causes for anomalies using GPT
 """
+import copy
 import logging
-from typing import Dict, Any, List
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
 from shared.openai_client import openai_client
+from shared.ttl_cache import TTLCache
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class HypothesisGenerator:
     """Generates hypotheses for anomaly root causes using chain-of-thought prompting"""
     
+    def __init__(self):
+        # Hypothesis sets by situation signature, so an anomaly storm costs one call per distinct situation
+        self.cache = TTLCache(settings.RCA_HYPOTHESIS_CACHE_MAX_ENTRIES, settings.RCA_HYPOTHESIS_CACHE_TTL_SECONDS)
+    
     def generate_hypotheses(self, anomaly_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Generate 5-7 hypotheses for the root cause of an anomaly
@@ -20,6 +28,13 @@ class HypothesisGenerator:
         Returns:
             List of hypotheses with plausibility scores
         """
+        signature = self._signature(anomaly_data)
+        cached = self.cache.get(signature)
+        if cached is not None:
+            logger.info(f"Reusing hypotheses for similar anomaly at {anomaly_data.get('gate_id')}")
+            # Callers annotate hypotheses in place, so never hand out the cached objects
+            return copy.deepcopy(cached)
+        
         logger.info(f"Generating hypotheses for anomaly at {anomaly_data.get('gate_id')}")
         
         # Build chain-of-thought prompt
@@ -33,19 +48,45 @@ class HypothesisGenerator:
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                cache_ttl_seconds=900
             )
             
             # Parse hypotheses from response
             hypotheses = self._parse_hypotheses(response["content"])
             
             logger.info(f"Generated {len(hypotheses)} hypotheses")
+            if hypotheses:
+                self.cache.set(signature, copy.deepcopy(hypotheses))
             return hypotheses
         
         except Exception as e:
             logger.error(f"Error generating hypotheses: {str(e)}")
             return self._fallback_hypotheses(anomaly_data)
     
+    def _signature(self, anomaly_data: Dict) -> Tuple:
+        """
+        Situation signature: anomalies with the same signature get the same diagnosis
+        
+        (stadium, gate, then queue, wait, processing time, time-of-day and anomaly
+        score buckets sized by the RCA_SIGNATURE_* settings)
+        """
+        try:
+            ts = datetime.fromisoformat(str(anomaly_data.get('timestamp')).replace('Z', '+00:00'))
+            time_band = (ts.hour * 60 + ts.minute) // settings.RCA_SIGNATURE_TIME_BAND_MINUTES
+        except ValueError:
+            time_band = None
+        
+        return (
+            anomaly_data.get('stadium_id'),
+            anomaly_data.get('gate_id'),
+            int((anomaly_data.get('queue_length') or 0) // settings.RCA_SIGNATURE_QUEUE_BUCKET),
+            int((anomaly_data.get('wait_time') or 0) // settings.RCA_SIGNATURE_WAIT_BAND),
+            int((anomaly_data.get('processing_time') or 0) // settings.RCA_SIGNATURE_PROCESSING_BUCKET),
+            time_band,
+            int((anomaly_data.get('anomaly_score') or 0) // settings.RCA_SIGNATURE_SCORE_BUCKET)
+        )
+    
     def _build_prompt(self, anomaly_data: Dict) -> str:
         """Build chain-of-thought prompt for hypothesis generation"""
         return f"""
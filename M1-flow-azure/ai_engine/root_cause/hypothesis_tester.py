@@ -2,8 +2,11 @@
 Hypothesis Tester - Executes tests to gather evidence for/against hypotheses
 """
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -18,36 +21,97 @@ class HypothesisTester:
             "OPERATIONAL": self._test_operational,
             "EXTERNAL": self._test_external
         }
+        self._pool = ThreadPoolExecutor(max_workers=settings.RCA_TEST_MAX_WORKERS, thread_name_prefix="hypothesis-test")
+        self.timed_out = 0
     
     def test_hypotheses(self, hypotheses: List[Dict], anomaly_data: Dict) -> List[Dict]:
         """
-        Test each hypothesis and collect evidence
+        Test each hypothesis concurrently and collect evidence
+        
+        Each test gets RCA_TEST_TIMEOUT_SECONDS from the moment a worker starts
+        it (time spent queued does not count), and all of them share an
+        RCA_TEST_DEADLINE_SECONDS deadline. Tests past either limit are reported
+        INCONCLUSIVE with timed_out set; queued ones are cancelled, running ones
+        finish in the background and their result is discarded.
         
         Args:
             hypotheses: List of hypotheses from generator
             anomaly_data: Anomaly context data
         
         Returns:
-            Hypotheses with test_results added
+            Hypotheses with test_results added (in input order)
         """
         logger.info(f"Testing {len(hypotheses)} hypotheses")
         
-        results = []
-        for hypothesis in hypotheses:
+        started = time.monotonic()
+        deadline = started + settings.RCA_TEST_DEADLINE_SECONDS
+        per_test = settings.RCA_TEST_TIMEOUT_SECONDS
+        
+        test_results = [None] * len(hypotheses)
+        test_starts = [None] * len(hypotheses)  # set by the worker when a test starts
+        pending = {}
+        for i, hypothesis in enumerate(hypotheses):
             category = hypothesis.get("category", "UNKNOWN")
             
             # Execute appropriate test
             if category in self.test_executors:
-                test_result = self.test_executors[category](hypothesis, anomaly_data)
+                future = self._pool.submit(self._run_test, test_starts, i, self.test_executors[category], hypothesis, anomaly_data)
+                pending[future] = i
             else:
-                test_result = {"verdict": "INCONCLUSIVE", "confidence": 0.0, "evidence": []}
+                test_results[i] = {"verdict": "INCONCLUSIVE", "confidence": 0.0, "evidence": []}
+        
+        submitted = list(pending)
+        while pending:
+            for future, i in list(pending.items()):
+                if future.done():
+                    del pending[future]
+                    test_results[i] = self._collect(future, hypotheses[i])
             
+            # Expire tests past their own timeout, and everything past the overall deadline
+            now = time.monotonic()
+            for future, i in list(pending.items()):
+                test_start = test_starts[i]
+                if now >= deadline or (test_start is not None and now - test_start >= per_test):
+                    del pending[future]
+                    future.cancel()
+                    self.timed_out += 1
+                    logger.warning(f"Test for hypothesis '{hypotheses[i].get('name')}' timed out")
+                    test_results[i] = {"verdict": "INCONCLUSIVE", "confidence": 0.0, "evidence": [], "timed_out": True}
+            if not pending:
+                break
+            
+            # Sleep until the next expiry or completion; a test still queued may start
+            # when an abandoned one finishes, so poll briefly while any are queued
+            expiries = [test_starts[i] + per_test for i in pending.values() if test_starts[i] is not None]
+            timeout = min([deadline] + expiries) - now
+            if any(test_starts[i] is None for i in pending.values()):
+                timeout = min(timeout, 0.05)
+            wait_futures([f for f in submitted if not f.done()], timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+        
+        results = []
+        for hypothesis, test_result in zip(hypotheses, test_results):
             # Add test results to hypothesis
             hypothesis["test_result"] = test_result
             results.append(hypothesis)
         
+        logger.info(f"Tested {len(hypotheses)} hypotheses in {(time.monotonic() - started) * 1000:.0f}ms")
         return results
     
+    @staticmethod
+    def _run_test(test_starts: List, index: int, executor, hypothesis: Dict, anomaly_data: Dict) -> Dict:
+        """Worker entry point: records when the test actually starts"""
+        test_starts[index] = time.monotonic()
+        return executor(hypothesis, anomaly_data)
+    
+    @staticmethod
+    def _collect(future, hypothesis: Dict) -> Dict:
+        """Result of a finished test, INCONCLUSIVE if it raised"""
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Test for hypothesis '{hypothesis.get('name')}' failed: {str(e)}")
+            return {"verdict": "INCONCLUSIVE", "confidence": 0.0, "evidence": [], "error": str(e)}
+    
     def _test_hardware(self, hypothesis: Dict, anomaly_data: Dict) -> Dict:
         """Test hardware-related hypotheses"""
         # Mock: Check device health logs
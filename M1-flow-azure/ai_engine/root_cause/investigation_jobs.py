@@ -0,0 +1,93 @@
+"""
+Investigation Jobs - Queue RCA investigations off the request path
+Anomalies found during a status read are recorded as pending investigations
+and processed by the rca-investigations queue trigger
+"""
+import logging
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any
+from shared.storage_client import storage_client
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class InvestigationJobQueue:
+    """Enqueues investigation jobs, reusing a recent job for the same gate"""
+    
+    def __init__(self, dedupe_seconds: int):
+        self.dedupe_seconds = dedupe_seconds
+        self._recent: Dict[tuple, tuple] = {}  # (stadium, gate) -> (enqueued_at, investigation_id)
+        self._lock = threading.Lock()
+        self.stats = {"enqueued": 0, "reused": 0}
+    
+    def enqueue(self, anomaly_data: Dict[str, Any]) -> str:
+        """
+        Record a pending investigation and queue it for the worker
+        
+        Args:
+            anomaly_data: Dict with stadium_id, gate_id, anomaly_score, queue_length, etc.
+        
+        Returns:
+            Investigation ID to poll via flow/investigation/{id}
+        """
+        key = (anomaly_data.get("stadium_id"), anomaly_data.get("gate_id"))
+        now = time.monotonic()
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent and now - recent[0] < self.dedupe_seconds:
+                self.stats["reused"] += 1
+                return recent[1]
+            
+            investigation_id = f"INV_{anomaly_data.get('gate_id')}_{int(datetime.utcnow().timestamp() * 1000)}"
+            self._recent[key] = (now, investigation_id)
+        
+        try:
+            # Pending row first, so a poll right after the response finds it
+            table_client = storage_client.get_table_client(settings.TABLE_NAME_INVESTIGATION_LOGS)
+            table_client.upsert_entity({
+                "PartitionKey": anomaly_data.get("stadium_id"),
+                "RowKey": investigation_id,
+                "gate_id": anomaly_data.get("gate_id"),
+                "anomaly_score": anomaly_data.get("anomaly_score"),
+                "timestamp": datetime.utcnow(),
+                "status": "pending"
+            })
+            
+            queue_client = storage_client.get_queue_client(settings.QUEUE_NAME_INVESTIGATIONS)
+            queue_client.send_message(json.dumps({
+                "investigation_id": investigation_id,
+                "anomaly_data": anomaly_data
+            }))
+        except Exception:
+            with self._lock:
+                self._recent.pop(key, None)
+            raise
+        
+        self.stats["enqueued"] += 1
+        logger.info(f"Queued investigation {investigation_id} for {key[1]}")
+        return investigation_id
+    
+    def mark_failed(self, stadium_id: str, investigation_id: str, error: str):
+        """Record a failed investigation so pollers stop waiting and the gate can be re-queued"""
+        with self._lock:
+            for key, (_, recent_id) in list(self._recent.items()):
+                if recent_id == investigation_id:
+                    del self._recent[key]
+        
+        table_client = storage_client.get_table_client(settings.TABLE_NAME_INVESTIGATION_LOGS)
+        table_client.upsert_entity({
+            "PartitionKey": stadium_id,
+            "RowKey": investigation_id,
+            "reasoning": error,
+            "status": "failed"
+        })
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+# Global job queue instance
+investigation_jobs = InvestigationJobQueue(settings.INVESTIGATION_DEDUPE_SECONDS)
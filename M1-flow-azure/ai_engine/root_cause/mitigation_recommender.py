@@ -154,7 +154,8 @@ Customize these actions for the specific context. Add any missing steps. Format
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.5,
-                max_tokens=500
+                max_tokens=500,
+                cache_ttl_seconds=1800
             )
             
             # Parse response
@@ -194,7 +195,8 @@ Format as JSON:
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.6,
-                max_tokens=400
+                max_tokens=400,
+                cache_ttl_seconds=1800
             )
             
             import re
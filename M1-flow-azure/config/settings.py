@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import Field
 
@@ -13,20 +13,71 @@ class Settings(BaseSettings):
     # Storage
     STORAGE_CONNECTION_STRING: str = Field(default="UseDevelopmentStorage=true", validation_alias="AzureWebJobsStorage")
     TABLE_NAME_GATES: str = "gatestatus"
+    TABLE_NAME_ACTIVITY: str = "stadiumactivity"
     QUEUE_NAME_INFLOW: str = "gates-inflow"
     QUEUE_NAME_CONTROL: str = "gates-control"
+    QUEUE_NAME_INVESTIGATIONS: str = "rca-investigations"
     BLOB_CONTAINER_MODELS: str = "ml-models"
+    STORAGE_ENSURE_ON_STARTUP: bool = True  # Create tables/queues/containers once when the worker starts
+    
+    # Ingestion
+    INGEST_BATCH_MAX_ITEMS: int = 5000  # Max measurements accepted per batch request
+    INGEST_BATCH_MESSAGE_SIZE: int = 50  # Measurements packed into one queue message (64KB limit)
+    INGEST_PROCESSING_MODE: str = "hybrid"  # sync | queue | hybrid
+    IDEMPOTENCY_MAX_KEYS: int = 20000  # Recent (stadium, gate, ts) keys remembered per worker
+    IDEMPOTENCY_TTL_SECONDS: int = 900
+    GATESTATUS_WRITE_BEHIND: bool = True  # Coalesce gatestatus upserts in memory and flush in batches
+    GATESTATUS_FLUSH_INTERVAL_MS: int = 1000  # Max staleness of the table vs. the latest measurement
+    GATESTATUS_MAX_PENDING: int = 5000  # Flush early once this many gates are buffered
+    GATESTATUS_MAX_WRITE_ATTEMPTS: int = 5  # Drop a gate state after this many failed flushes
+    STATUS_SNAPSHOT_MAX_AGE_SECONDS: int = 15  # Re-read gatestatus after this long (bounds cross-worker staleness)
+    STATUS_SCORING_MAX_WORKERS: int = 16  # Concurrent anomaly scoring calls per worker
+    STATUS_SCORING_DEADLINE_MS: int = 1500  # Gates not scored by then return anomaly: null
+    ACTIVITY_HEARTBEAT_SECONDS: int = 60  # Max rate of stadium heartbeat writes per worker
     
     # OpenAI Configuration
     OPENAI_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-3.5-turbo"  # Use 3.5 to save costs
     OPENAI_MAX_TOKENS: int = 1500
+    OPENAI_CACHE_ENABLED: bool = True  # Reuse completions for identical requests
+    OPENAI_CACHE_MAX_ENTRIES: int = 1000
+    OPENAI_CACHE_TTL_SECONDS: int = 900  # Default; call sites may pass their own TTL
+    OPENAI_CACHE_TABLE_TIER: bool = False  # Also share cached completions across workers via Table Storage
+    TABLE_NAME_COMPLETION_CACHE: str = "completioncache"
+    
+    # Root-cause analysis
+    RCA_HYPOTHESIS_CACHE_TTL_SECONDS: int = 600  # Freshness window for reusing a hypothesis set
+    RCA_HYPOTHESIS_CACHE_MAX_ENTRIES: int = 500
+    # Situation signature buckets: anomalies in the same buckets reuse a hypothesis set
+    RCA_SIGNATURE_QUEUE_BUCKET: int = 25  # people
+    RCA_SIGNATURE_WAIT_BAND: float = 2.0  # minutes
+    RCA_SIGNATURE_PROCESSING_BUCKET: float = 1.0  # seconds
+    RCA_SIGNATURE_TIME_BAND_MINUTES: int = 30  # time of day
+    RCA_SIGNATURE_SCORE_BUCKET: float = 0.5
+    RCA_INVESTIGATION_CACHE_MAX_ENTRIES: int = 500
+    RCA_INVESTIGATION_CACHE_MAX_BYTES: int = 20 * 1024 * 1024  # Estimated from the JSON size of reports
+    RCA_INVESTIGATION_SCORE_BUCKET: float = 0.5  # Anomaly scores in the same bucket share a report
+    RCA_TEST_MAX_WORKERS: int = 8  # Hypothesis tests run concurrently per worker
+    RCA_TEST_TIMEOUT_SECONDS: float = 5.0  # Per-test limit
+    RCA_TEST_DEADLINE_SECONDS: float = 10.0  # Limit for all tests of one investigation
+    RCA_PREBUILD_PLANS: int = 1  # Mitigation plans built for the leading hypotheses while tests run
+    RCA_PLAN_MAX_WORKERS: int = 8  # Plan prebuilds running at once, shared by all investigations
+    RCA_PLAN_CONFIDENCE_TOLERANCE: float = 0.15  # Rebuild a prebuilt plan if the final confidence moved further
+    
+    # Agent Orchestrator
+    AGENT_MAX_PARALLEL_STADIUMS: int = 8  # Stadium agents run concurrently per timer run
+    AGENT_RUN_BUDGET_SECONDS: int = 90  # Per-run time budget (timer fires every 2 minutes)
+    AGENT_SKIP_UNCHANGED: bool = True  # Reuse the last decision when the state fingerprint is unchanged
+    AGENT_DECISION_MAX_REUSE_MINUTES: int = 20  # Force a fresh decision at least this often
+    AGENT_FINGERPRINT_QUEUE_BUCKET: int = 20  # Queue lengths in the same bucket fingerprint alike
+    AGENT_FINGERPRINT_WAIT_BAND: float = 2.0  # Minutes
     
     # AI Storage
     TABLE_NAME_AI_DECISIONS: str = "aidecisions"
     TABLE_NAME_AGENT_MEMORY: str = "agentmemory"
     TABLE_NAME_INVESTIGATION_LOGS: str = "investigationlogs"
+    INVESTIGATION_DEDUPE_SECONDS: int = 900  # Reuse a gate's queued investigation within this window
     BLOB_CONTAINER_DECISION_TRACES: str = "decision-traces"
     
     # AWS
@@ -34,9 +85,44 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_REGION: str = "eu-north-1"
     SAGEMAKER_ENDPOINT_NAME: Optional[str] = None
+    SAGEMAKER_MAX_RECORDS_PER_CALL: int = 100  # Data points packed into one invoke_endpoint request
+    SAGEMAKER_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    SAGEMAKER_READ_TIMEOUT_SECONDS: float = 2.0
+    SAGEMAKER_MAX_ATTEMPTS: int = 1  # boto3 attempts per call (1 = no retries; the breaker handles failures)
+    SAGEMAKER_BREAKER_FAILURE_RATE: float = 0.5  # Open the breaker at this failure rate...
+    SAGEMAKER_BREAKER_WINDOW: int = 20  # ...over the last N calls
+    SAGEMAKER_BREAKER_MIN_CALLS: int = 5
+    SAGEMAKER_BREAKER_OPEN_SECONDS: float = 30.0  # Time before a half-open probe call
+    ANOMALY_CACHE_MAX_ENTRIES: int = 10000
+    ANOMALY_CACHE_TTL_SECONDS: int = 300
+    ANOMALY_CACHE_STADIUM_TTL_SECONDS: Dict[str, int] = {}  # Per-stadium override, e.g. {"AGADIR": 60}
+    ANOMALY_CACHE_QUEUE_BUCKET: int = 10  # Queue lengths in the same bucket share a cached score
+    ANOMALY_CACHE_WAIT_BUCKET: float = 1.0  # Minutes
+    ANOMALY_CACHE_PROCESSING_BUCKET: float = 1.0
+    ANOMALY_DETECTOR: str = "sagemaker"  # sagemaker | local (in-process streaming detector)
+    ANOMALY_LOCAL_ALPHA: float = 0.05  # EWMA weight of each new measurement
+    ANOMALY_LOCAL_THRESHOLD: float = 3.0  # Robust z-score above which a gate is anomalous
+    ANOMALY_LOCAL_WARMUP_SAMPLES: int = 20  # Measurements per gate before flagging anomalies
     
     # ML
     MODEL_FILENAME: str = "wait_time_model.onnx"
+    MODEL_SOURCE: str = "local"  # local | blob (BLOB_CONTAINER_MODELS)
+    MODEL_LOCAL_DIR: Optional[str] = None  # Defaults to shared/ml/models
+    MODEL_CACHE_DIR: Optional[str] = None  # Where blob models are downloaded, defaults to <tempdir>/fanops-models
+    MODEL_REFRESH_INTERVAL_SECONDS: int = 300  # Poll for a new model version (0 disables hot reload)
+    ONNX_PRELOAD_ON_STARTUP: bool = True  # Load and warm up the model when the worker starts
+    ONNX_WARMUP_ON_LOAD: bool = True
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 = onnxruntime default
+    ONNX_INTER_OP_THREADS: int = 0
+    ONNX_GRAPH_OPTIMIZATION_LEVEL: str = "all"  # disable | basic | extended | all
+    ONNX_OPTIMIZED_MODEL_CACHE: bool = True  # Save the optimised graph on first load, reuse it afterwards
+    ONNX_OPTIMIZED_MODEL_DIR: Optional[str] = None  # Defaults to <tempdir>/fanops-onnx
+    ONNX_ENABLE_MEM_ARENA: bool = True
+    ONNX_ENABLE_MEM_PATTERN: bool = True
+    INFERENCE_MICRO_BATCHING: bool = True  # Coalesce concurrent single-row predictions
+    INFERENCE_BATCH_WINDOW_MS: float = 2.0  # Max time a request waits for others to join its batch
+    INFERENCE_BATCH_MAX_ROWS: int = 64
+    INFERENCE_BATCH_TIMEOUT_SECONDS: float = 5.0
     
     class Config:
         env_file = ".env"
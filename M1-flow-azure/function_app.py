@@ -1,10 +1,14 @@
 import azure.functions as func
+import threading
 from handlers.flow_ingest import flow_ingest_bp
 from handlers.flow_status import flow_status_bp
 from handlers.process_queue import process_queue_bp
 from handlers.ai_insights import ai_insights_bp
 from handlers.agent_orchestrator import agent_orchestrator_bp
 from handlers.investigation import investigation_bp
+from handlers.runtime_metrics import runtime_metrics_bp
+from shared.storage_client import storage_client
+from config.settings import settings
 
 app = func.FunctionApp()
 
@@ -14,3 +18,14 @@ app.register_blueprint(process_queue_bp)
 app.register_blueprint(ai_insights_bp)
 app.register_blueprint(agent_orchestrator_bp)
 app.register_blueprint(investigation_bp)
+app.register_blueprint(runtime_metrics_bp)
+
+# Create storage resources once per worker instead of on every request.
+# Runs in the background so slow or unreachable storage does not delay host startup.
+if settings.STORAGE_ENSURE_ON_STARTUP:
+    threading.Thread(target=storage_client.ensure_resources, name="storage-ensure", daemon=True).start()
+
+# Load and warm up the wait-time model before the first measurement arrives
+if settings.ONNX_PRELOAD_ON_STARTUP:
+    from shared.ml.onnx_inference import get_inference_engine
+    get_inference_engine()
@@ -4,14 +4,24 @@ Agent Orchestrator - Timer Trigger that runs agent every 2 minutes
 import azure.functions as func
 import logging
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 from datetime import datetime
+from typing import List
 from ai_engine.agent.orchestration_agent import OrchestrationAgent
 from ai_engine.agent.decision_logger import decision_logger
-from shared.storage_client import storage_client
+from ai_engine.agent.state_fingerprint import compute_state_fingerprint
+from shared.activity_index import activity_index
 from config.settings import settings
 
 agent_orchestrator_bp = func.Blueprint()
 
+# Shared across timer runs, so agents overrunning their budget cannot pile up threads
+_agent_pool = ThreadPoolExecutor(max_workers=settings.AGENT_MAX_PARALLEL_STADIUMS, thread_name_prefix="agent")
+_running_stadiums = set()  # stadiums whose agent run has not finished yet
+_running_lock = threading.Lock()
+
 @agent_orchestrator_bp.schedule(
     schedule="0 */2 * * * *",  # Every 2 minutes
     arg_name="timer",
@@ -26,63 +36,108 @@ def agent_orchestrator(timer: func.TimerRequest) -> None:
     logging.info('Agent Orchestrator triggered')
     
     try:
-        # Check if match is active (has recent gate data)
-        if not _is_match_active():
+        # Active stadiums = partitions with recent gate data
+        stadiums = _get_active_stadiums()
+        if not stadiums:
             logging.info("No active match detected. Skipping agent run.")
             return
         
-        # Run agent for each active stadium
-        stadiums = ["AGADIR"]  # TODO: Get from configuration or detect dynamically
+        # Skip stadiums whose agent from an earlier run is still going
+        with _running_lock:
+            skipped = [stadium_id for stadium_id in stadiums if stadium_id in _running_stadiums]
+            stadiums = [stadium_id for stadium_id in stadiums if stadium_id not in _running_stadiums]
+            _running_stadiums.update(stadiums)
+        for stadium_id in skipped:
+            logging.warning(f"Previous agent run for {stadium_id} still in progress, skipping")
+        
+        # Run agents concurrently; each one must finish within the run budget
+        deadline = time.monotonic() + settings.AGENT_RUN_BUDGET_SECONDS
+        futures = {_agent_pool.submit(_run_tracked, stadium_id, deadline): stadium_id for stadium_id in stadiums}
+        
+        # Grace period for agents that hit the deadline mid-call to return their fallback
+        done, not_done = wait_futures(futures, timeout=settings.AGENT_RUN_BUDGET_SECONDS + 10)
         
-        for stadium_id in stadiums:
-            logging.info(f"Running orchestration agent for {stadium_id}")
-            
-            # Create and run agent
-            agent = OrchestrationAgent(stadium_id=stadium_id)
-            decision = agent.make_decision()
-            
-            # Log decision
-            decision_id = decision_logger.log_decision(decision, stadium_id)
-            
-            logging.info(f"Agent decision logged: {decision_id}")
-            logging.info(f"Decision: {decision.get('decision', '')}")
-            logging.info(f"Confidence: {decision.get('confidence', 0.0)}")
-            
-            # Log metrics
-            metadata = decision.get("metadata", {})
-            logging.info(f"Iterations: {metadata.get('iterations', 0)}")
-            logging.info(f"Functions called: {metadata.get('functions_called', [])}")
-            logging.info(f"Cost: ${metadata.get('total_cost_usd', 0.0):.4f}")
+        for future in done:
+            if future.exception() is not None:
+                logging.error(f"Agent run for {futures[future]} failed: {str(future.exception())}")
+        for future in not_done:
+            logging.warning(f"Agent run for {futures[future]} exceeded the time budget")
+        
+        logging.info(f"Agent runs finished: {len(done)}/{len(stadiums)} stadiums")
     
     except Exception as e:
         logging.error(f"Agent orchestrator error: {str(e)}")
         raise
 
-def _is_match_active() -> bool:
+def _run_tracked(stadium_id: str, deadline: float) -> str:
+    """Run the agent and release the stadium for the next timer run"""
+    try:
+        return _run_agent(stadium_id, deadline)
+    finally:
+        with _running_lock:
+            _running_stadiums.discard(stadium_id)
+
+def _run_agent(stadium_id: str, deadline: float) -> str:
+    """Run the orchestration agent for one stadium and log its decision"""
+    logging.info(f"Running orchestration agent for {stadium_id}")
+    
+    fingerprint = compute_state_fingerprint(stadium_id)
+    previous = None
+    if settings.AGENT_SKIP_UNCHANGED:
+        previous = decision_logger.get_last_decision(stadium_id, settings.AGENT_DECISION_MAX_REUSE_MINUTES)
+    
+    if previous and not previous.get("fallback") and previous.get("state_fingerprint") == fingerprint:
+        # Same situation as last time: reuse the decision instead of calling the LLM
+        logging.info(f"No gate change at {stadium_id} since {previous['RowKey']}, reusing decision")
+        decision = _reuse_decision(previous)
+    else:
+        # Create and run agent
+        agent = OrchestrationAgent(stadium_id=stadium_id)
+        decision = agent.make_decision(deadline=deadline)
+    decision.setdefault("metadata", {})["state_fingerprint"] = fingerprint
+    
+    # Log decision
+    decision_id = decision_logger.log_decision(decision, stadium_id)
+    
+    logging.info(f"Agent decision logged: {decision_id}")
+    logging.info(f"Decision: {decision.get('decision', '')}")
+    logging.info(f"Confidence: {decision.get('confidence', 0.0)}")
+    
+    # Log metrics
+    metadata = decision.get("metadata", {})
+    logging.info(f"Iterations: {metadata.get('iterations', 0)}")
+    logging.info(f"Functions called: {metadata.get('functions_called', [])}")
+    logging.info(f"Cost: ${metadata.get('total_cost_usd', 0.0):.4f}")
+    
+    return decision_id
+
+def _reuse_decision(previous: dict) -> dict:
+    """Decision dict repeating a logged decision, marked as no_change"""
+    return {
+        "decision": previous.get("decision_text", ""),
+        "confidence": previous.get("confidence", 0.0),
+        "reasoning": previous.get("reasoning", ""),
+        "full_response": previous.get("full_response", ""),
+        "no_change": True,
+        "reused_decision_id": previous.get("reused_decision_id") or previous["RowKey"],
+        "decided_at": previous.get("decided_at") or previous.get("timestamp"),
+        "metadata": {
+            "iterations": 0,
+            "functions_called": [],
+            "total_cost_usd": 0.0,
+            "model": previous.get("model", "unknown"),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    }
+
+def _get_active_stadiums() -> List[str]:
     """
-    Check if there's an active match by looking for recent gate data
-    Returns True if data was updated in last 10 minutes
+    Find stadiums with an active match by looking for recent gate data
+    Returns the stadium IDs with gate writes in the last 10 minutes (one point read)
     """
     try:
-        table_client = storage_client.get_table_client(settings.TABLE_NAME_GATES)
-        
-        # Query all entities
-        entities = list(table_client.query_entities(""))
-        
-        if not entities:
-            return False
-        
-        # Check if any entity was updated recently
-        from datetime import timedelta
-        cutoff = datetime.utcnow() - timedelta(minutes=10)
-        
-        for entity in entities:
-            timestamp = entity.get('Timestamp')
-            if timestamp and timestamp > cutoff:
-                return True
-        
-        return False
+        return activity_index.active_stadiums(window_minutes=10)
     
     except Exception as e:
         logging.warning(f"Error checking match activity: {str(e)}")
-        return False
+        return []
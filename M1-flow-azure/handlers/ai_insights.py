@@ -57,7 +57,8 @@ def ai_insights(req: func.HttpRequest) -> func.HttpResponse:
                 "decision": entity.get('decision_text', ''),
                 "confidence": entity.get('confidence', 0.0),
                 "cost_usd": entity.get('cost_usd', 0.0),
-                "fallback": entity.get('fallback', False)
+                "fallback": entity.get('fallback', False),
+                "no_change": entity.get('no_change', False)
             })
         
         # Build response
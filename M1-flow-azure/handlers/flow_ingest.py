@@ -4,6 +4,9 @@ import json
 from shared.models import GateMeasurement
 from shared.storage_client import storage_client
 from config.settings import settings
+from handlers.process_queue import (
+    BatchProcessingError, process_measurement_sync, process_measurements_sync, get_processing_mode
+)
 
 flow_ingest_bp = func.Blueprint()
 
@@ -16,16 +19,25 @@ def flow_ingest(req: func.HttpRequest) -> func.HttpResponse:
         # Validate with Pydantic
         measurement = GateMeasurement(**req_body)
         
-        # Push to Queue
-        queue_client = storage_client.get_queue_client(settings.QUEUE_NAME_INFLOW)
-        queue_client.send_message(json.dumps(measurement.dict()))
+        mode = get_processing_mode()
         
-        # TEMPORARY WORKAROUND: Process synchronously since queue trigger isn't firing
-        from handlers.process_queue import process_measurement_sync
-        process_measurement_sync(measurement)
+        # Push to Queue (queue and hybrid modes)
+        if mode != "sync":
+            queue_client = storage_client.get_queue_client(settings.QUEUE_NAME_INFLOW)
+            queue_client.send_message(json.dumps(measurement.dict()))
+        
+        # Process inline (sync and hybrid modes); the queue copy is dropped as a duplicate
+        if mode == "sync":
+            process_measurement_sync(measurement)
+        elif mode == "hybrid":
+            try:
+                process_measurement_sync(measurement)
+            except Exception as e:
+                # Already enqueued, the queue trigger will pick it up
+                logging.warning(f"Inline processing failed for {measurement.gateId}: {str(e)}")
         
         return func.HttpResponse(
-            json.dumps({"status": "accepted", "gateId": measurement.gateId}),
+            json.dumps({"status": "accepted", "gateId": measurement.gateId, "mode": mode}),
             mimetype="application/json",
             status_code=202
         )
@@ -42,3 +54,139 @@ def flow_ingest(req: func.HttpRequest) -> func.HttpResponse:
             status_code=500,
             mimetype="application/json"
         )
+
+@flow_ingest_bp.route(route="flow/ingest/batch", auth_level=func.AuthLevel.ANONYMOUS, methods=["POST"])
+def flow_ingest_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Ingest many gate measurements in a single request
+    
+    Body:
+        JSON array of measurements, or NDJSON (one measurement per line)
+    
+    Returns:
+        Per-item accept/reject results. Invalid rows are rejected individually,
+        valid rows are enqueued in groups of INGEST_BATCH_MESSAGE_SIZE per message.
+    """
+    logging.info('Processing batch flow ingestion request.')
+    
+    try:
+        items = _parse_batch_body(req.get_body().decode('utf-8'))
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON or NDJSON body", "details": str(e)}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    if len(items) > settings.INGEST_BATCH_MAX_ITEMS:
+        return func.HttpResponse(
+            json.dumps({"error": f"Batch too large (max {settings.INGEST_BATCH_MAX_ITEMS} measurements)"}),
+            status_code=413,
+            mimetype="application/json"
+        )
+    
+    try:
+        # Validate every row in one pass; a bad row only rejects itself
+        results = []
+        accepted = []
+        result_by_row = {}  # id(measurement) -> its result entry
+        for index, item in enumerate(items):
+            try:
+                if isinstance(item, Exception):
+                    raise item
+                if not isinstance(item, dict):
+                    raise ValueError("Measurement must be a JSON object")
+                measurement = GateMeasurement(**item)
+                accepted.append(measurement)
+                results.append({"index": index, "status": "accepted", "gateId": measurement.gateId})
+                result_by_row[id(measurement)] = results[-1]
+            except ValueError as e:
+                results.append({"index": index, "status": "rejected", "error": str(e)})
+        
+        mode = get_processing_mode()
+        
+        # Push to Queue, several measurements per message (queue and hybrid modes)
+        messages_sent = 0
+        if accepted and mode != "sync":
+            queue_client = storage_client.get_queue_client(settings.QUEUE_NAME_INFLOW)
+            chunk_size = max(1, settings.INGEST_BATCH_MESSAGE_SIZE)
+            for start in range(0, len(accepted), chunk_size):
+                chunk = accepted[start:start + chunk_size]
+                queue_client.send_message(json.dumps({"measurements": [m.dict() for m in chunk]}))
+                messages_sent += 1
+        
+        # Process inline with one batched inference (sync and hybrid modes)
+        if accepted and mode != "queue":
+            try:
+                process_measurements_sync(accepted)
+            except BatchProcessingError as e:
+                if mode == "sync":
+                    # Nothing was enqueued: report the failed rows, the others are stored
+                    for measurement, error in e.failures:
+                        result = result_by_row[id(measurement)]
+                        result["status"] = "failed"
+                        result["error"] = str(error)
+                else:
+                    # Already enqueued, the queue trigger will pick up failed rows
+                    logging.warning(f"Inline batch processing failed: {str(e)}")
+            except Exception as e:
+                if mode == "sync":
+                    raise
+                logging.warning(f"Inline batch processing failed: {str(e)}")
+        
+        rejected_count = len(results) - len(accepted)
+        failed_count = sum(1 for result in results if result["status"] == "failed")
+        if not accepted:
+            status = "rejected"
+        elif rejected_count or failed_count:
+            status = "partial"
+        else:
+            status = "accepted"
+        
+        return func.HttpResponse(
+            json.dumps({
+                "status": status,
+                "accepted": len(accepted),
+                "rejected": rejected_count,
+                "failed": failed_count,
+                "messages": messages_sent,
+                "mode": mode,
+                "results": results
+            }),
+            mimetype="application/json",
+            status_code=202 if accepted else 400
+        )
+    except Exception as e:
+        logging.error(f"Error in flow_ingest_batch: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": "Internal Server Error"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+def _parse_batch_body(body: str) -> list:
+    """
+    Parse a JSON array or NDJSON body into a list of items.
+    NDJSON lines that fail to parse are returned as ValueError items so they
+    can be rejected individually instead of failing the whole batch.
+    """
+    body = body.strip()
+    if not body:
+        raise ValueError("Empty body")
+    
+    if body.startswith('['):
+        items = json.loads(body)
+        if not isinstance(items, list):
+            raise ValueError("Expected a JSON array of measurements")
+        return items
+    
+    items = []
+    for line_no, line in enumerate(body.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(ValueError(f"Line {line_no}: {str(e)}"))
+    return items
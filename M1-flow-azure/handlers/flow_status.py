@@ -1,12 +1,77 @@
 import azure.functions as func
+import hashlib
 import logging
 import json
 from datetime import datetime
-from shared.storage_client import storage_client
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from typing import List, Optional
+from shared.stadium_snapshot import stadium_snapshots
+from shared.ml.streaming_detector import get_anomaly_detector
 from config.settings import settings
 
 flow_status_bp = func.Blueprint()
 
+# Shared across requests so concurrent status calls cannot exceed the bound
+_scoring_pool = ThreadPoolExecutor(max_workers=settings.STATUS_SCORING_MAX_WORKERS, thread_name_prefix="anomaly-scoring")
+
+
+def _score_gates(gate_metrics: List[dict]) -> List[Optional[dict]]:
+    """
+    Score gates within STATUS_SCORING_DEADLINE_MS, one multi-record
+    SageMaker call per chunk with the chunks running concurrently
+    
+    Args:
+        gate_metrics: Data points for the detector's check_anomalies
+    
+    Returns:
+        Anomaly result per gate, None for gates that missed the deadline or failed
+    """
+    detector = get_anomaly_detector()
+    
+    chunk_size = max(1, settings.SAGEMAKER_MAX_RECORDS_PER_CALL)
+    chunks = [gate_metrics[start:start + chunk_size] for start in range(0, len(gate_metrics), chunk_size)]
+    futures = [_scoring_pool.submit(detector.check_anomalies, chunk) for chunk in chunks]
+    wait_futures(futures, timeout=settings.STATUS_SCORING_DEADLINE_MS / 1000.0)
+    
+    results = []
+    for chunk, future in zip(chunks, futures):
+        if not future.done():
+            # Left running; its result still lands in the client cache for the next poll
+            logging.warning(f"Anomaly scoring for {len(chunk)} gates missed the deadline")
+            results.extend([None] * len(chunk))
+        elif future.exception() is not None:
+            logging.error(f"Anomaly scoring for {len(chunk)} gates failed: {str(future.exception())}")
+            results.extend([None] * len(chunk))
+        else:
+            results.extend(future.result())
+    return results
+
+
+def _response_etag(snapshot_etag: str, gates: List[dict]) -> str:
+    """
+    ETag over the gate state and the anomaly/investigation fields of the response
+    
+    Args:
+        snapshot_etag: Content ETag of the stadium snapshot
+        gates: Response gate entries
+    
+    Returns:
+        Quoted ETag value
+    """
+    anomalies = [
+        [
+            gate["gateId"],
+            gate["anomaly"],
+            round(gate["anomalyScore"], 2) if gate["anomalyScore"] is not None else None,
+            gate.get("investigation_id"),
+            gate.get("investigation_status")
+        ]
+        for gate in gates
+    ]
+    content = (snapshot_etag or "") + json.dumps(anomalies, default=str)
+    return '"' + hashlib.sha1(content.encode()).hexdigest() + '"'
+
+
 @flow_status_bp.route(route="flow/status", auth_level=func.AuthLevel.ANONYMOUS, methods=["GET"])
 def flow_status(req: func.HttpRequest) -> func.HttpResponse:
     stadium_id = req.params.get('stadiumId')
@@ -17,42 +82,62 @@ def flow_status(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
+    since = req.params.get('since')
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "since must be an integer version"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
     try:
-        table_client = storage_client.get_table_client(settings.TABLE_NAME_GATES)
-        filter_query = f"PartitionKey eq '{stadium_id}'"
-        entities = table_client.query_entities(filter_query)
+        # Served from the in-memory snapshot; the table is only read when it is cold or stale
+        snapshot = stadium_snapshots.get(stadium_id)
+        if snapshot is None:
+            # No gate data yet (e.g. before the first reading); not cached, nothing to score
+            return func.HttpResponse(
+                json.dumps({"stadiumId": stadium_id, "version": 0, "delta": since is not None, "gates": []}),
+                mimetype="application/json"
+            )
         
-        gates = []
-        from shared.ml.aws_anomaly_client import aws_client
+        entities = snapshot.gates_since()
         
-        for entity in entities:
-            gate_id = entity['RowKey']
-            wait = entity.get('wait', 0)
-            state = entity.get('state', 'green')
-            last_updated = str(entity.get('Timestamp', ''))
-            
-            # Construct data point for anomaly check
-            gate_metrics = {
-                "gateId": gate_id,
-                "wait": wait,
-                "queueLength": entity.get('queueLength', 0),
-                "processingTime": entity.get('processingTime', 0)
+        # Construct data points for anomaly check
+        all_metrics = [
+            {
+                "stadiumId": stadium_id,
+                "gateId": entity['gateId'],
+                "wait": entity.get('wait') or 0,
+                "queueLength": entity.get('queueLength') or 0,
+                "processingTime": entity.get('processingTime') or 0,
+                "perMinuteCount": entity.get('perMinuteCount') or 0,
+                "last_ts": entity.get('last_ts')
             }
-            
-            # Check for anomaly (AWS SageMaker)
-            anomaly_result = aws_client.check_anomaly(gate_metrics)
+            for entity in entities
+        ]
+        
+        # Scored before the 304 decision so a new anomaly on an unchanged gate is still
+        # delivered and investigated (scores come from the detector's cache when warm)
+        anomaly_results = _score_gates(all_metrics)
+        
+        gates = []
+        for entity, gate_metrics, anomaly_result in zip(entities, all_metrics, anomaly_results):
+            gate_id = entity['gateId']
+            wait = gate_metrics['wait']
             
             gate_data = {
                 "gateId": gate_id,
                 "wait": wait,
-                "state": state,
-                "last_updated": last_updated,
-                "anomaly": anomaly_result['anomaly'],
-                "anomalyScore": anomaly_result['score']
+                "state": entity.get('state') or 'green',
+                "last_updated": entity['last_updated'],
+                "anomaly": anomaly_result['anomaly'] if anomaly_result else None,
+                "anomalyScore": anomaly_result['score'] if anomaly_result else None
             }
             
             # TRIGGER RCA if anomaly detected
-            if anomaly_result['anomaly']:
+            if anomaly_result and anomaly_result['anomaly']:
                 logging.info(f"Anomaly detected at {gate_id}, triggering RCA investigation")
                 
                 # Prepare anomaly data for investigation
@@ -66,22 +151,35 @@ def flow_status(req: func.HttpRequest) -> func.HttpResponse:
                     "timestamp": datetime.utcnow().isoformat()
                 }
                 
-                # Run RCA investigation
+                # Queue RCA investigation (deduplicated per gate); poll flow/investigation/{id} for the result
                 try:
-                    from ai_engine.root_cause.anomaly_investigator import anomaly_investigator
-                    investigation = anomaly_investigator.investigate(anomaly_data)
-                    gate_data["investigation_id"] = investigation.get("investigation_id")
-                    gate_data["investigation_status"] = "completed"
-                    gate_data["root_cause"] = investigation.get("diagnosis", {}).get("root_cause")
+                    from ai_engine.root_cause.investigation_jobs import investigation_jobs
+                    gate_data["investigation_id"] = investigation_jobs.enqueue(anomaly_data)
+                    gate_data["investigation_status"] = "pending"
                 except Exception as e:
-                    logging.error(f"RCA investigation failed: {str(e)}")
+                    logging.error(f"Failed to queue RCA investigation: {str(e)}")
                     gate_data["investigation_status"] = "failed"
             
             gates.append(gate_data)
+        
+        etag = _response_etag(snapshot.etag, gates)
+        headers = {"ETag": etag}
+        if req.headers.get('If-None-Match') == etag:
+            return func.HttpResponse(status_code=304, headers=headers)
+        
+        # Delta: gates written after `since`, plus every gate that is currently anomalous
+        if since is not None:
+            gates = [
+                gate for gate, entity in zip(gates, entities)
+                if entity["version"] > since or gate["anomaly"]
+            ]
+            if not gates:
+                return func.HttpResponse(status_code=304, headers=headers)
             
         return func.HttpResponse(
-            json.dumps({"stadiumId": stadium_id, "gates": gates}),
-            mimetype="application/json"
+            json.dumps({"stadiumId": stadium_id, "version": snapshot.version, "delta": since is not None, "gates": gates}),
+            mimetype="application/json",
+            headers=headers
         )
     except Exception as e:
         logging.error(f"Error in flow_status: {str(e)}")
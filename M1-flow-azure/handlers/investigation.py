@@ -9,6 +9,37 @@ from config.settings import settings
 
 investigation_bp = func.Blueprint()
 
+@investigation_bp.queue_trigger(arg_name="msg", queue_name="rca-investigations", connection="AzureWebJobsStorage")
+def process_investigation_queue(msg: func.QueueMessage) -> None:
+    """
+    Run a queued RCA investigation (enqueued by flow/status)
+    
+    The result is stored under the queued investigation_id, replacing the pending row.
+    Errors mark the investigation failed instead of retrying the message.
+    """
+    from ai_engine.root_cause.anomaly_investigator import anomaly_investigator
+    from ai_engine.root_cause.investigation_jobs import investigation_jobs
+    
+    try:
+        body = json.loads(msg.get_body().decode('utf-8'))
+        investigation_id = body["investigation_id"]
+        anomaly_data = body["anomaly_data"]
+    except Exception as e:
+        logging.error(f"Dropping malformed investigation message: {str(e)}")
+        return
+    
+    logging.info(f"Running queued investigation {investigation_id}")
+    try:
+        report = anomaly_investigator.investigate(anomaly_data, investigation_id=investigation_id)
+        error = report.get("error", "") if report.get("status") == "failed" else None
+    except Exception as e:
+        error = str(e)
+    
+    if error is not None:
+        logging.error(f"Investigation {investigation_id} failed: {error}")
+        # If storage is down this raises, and the host retries the message
+        investigation_jobs.mark_failed(anomaly_data.get("stadium_id"), investigation_id, error)
+
 @investigation_bp.route(route="flow/investigation/{investigation_id}", auth_level=func.AuthLevel.ANONYMOUS, methods=["GET"])
 def get_investigation(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -55,6 +86,7 @@ def get_investigation(req: func.HttpRequest) -> func.HttpResponse:
         all_hypotheses = []
         tested_hypotheses = []
         bayesian_analysis = {}
+        stage_timings = {}
         
         try:
             if entity.get('all_hypotheses'):
@@ -73,6 +105,12 @@ def get_investigation(req: func.HttpRequest) -> func.HttpResponse:
                 bayesian_analysis = json_module.loads(entity['bayesian_analysis'])
         except:
             pass
+            
+        try:
+            if entity.get('stage_timings_ms'):
+                stage_timings = json_module.loads(entity['stage_timings_ms'])
+        except:
+            pass
         
         # Format response with full details
         response_data = {
@@ -94,7 +132,8 @@ def get_investigation(req: func.HttpRequest) -> func.HttpResponse:
                 "actions": entity.get('mitigation_actions', '').split('\n') if entity.get('mitigation_actions') else []
             },
             "status": entity.get('status', 'unknown'),
-            "execution_time_ms": entity.get('execution_time_ms', 0)
+            "execution_time_ms": entity.get('execution_time_ms', 0),
+            "stage_timings_ms": stage_timings
         }
         
         return func.HttpResponse(
@@ -3,70 +3,238 @@ import logging
 import json
 from shared.models import GateMeasurement
 from shared.storage_client import storage_client
+from shared.idempotency import idempotency_guard, measurement_key
+from shared.gate_state_writer import gate_state_writer
+from shared.stadium_snapshot import stadium_snapshots
+from shared.activity_index import activity_index
+from shared.ml.streaming_detector import streaming_detector
 from config.settings import settings
 from datetime import datetime
+from typing import List, Optional, Tuple
+from azure.core.exceptions import ResourceNotFoundError
 
 process_queue_bp = func.Blueprint()
 
+# Ingest processing modes:
+#   sync   - HTTP handler processes inline, nothing is enqueued
+#   queue  - HTTP handler only enqueues, the queue trigger processes
+#   hybrid - both; duplicates are dropped by (stadium, gate, ts) idempotency key
+PROCESSING_MODES = ("sync", "queue", "hybrid")
 
-def process_measurement_sync(measurement: GateMeasurement):
-    """Synchronous processing function that can be called directly"""
+
+class BatchProcessingError(RuntimeError):
+    """Some rows of a batch failed; `failures` lists (measurement, exception), the other rows are stored"""
+    
+    def __init__(self, message: str, failures: list):
+        super().__init__(message)
+        self.failures = failures
+
+
+def get_processing_mode() -> str:
+    """Configured ingest processing mode (falls back to hybrid if invalid)"""
+    mode = (settings.INGEST_PROCESSING_MODE or "").lower()
+    if mode not in PROCESSING_MODES:
+        logging.warning(f"Unknown INGEST_PROCESSING_MODE '{mode}', using hybrid")
+        return "hybrid"
+    return mode
+
+
+def _ts_at_least(stored_ts: Optional[str], ts: str) -> bool:
+    """Whether a stored measurement timestamp is the same as or newer than ts"""
+    if not stored_ts:
+        return False
     try:
-        logging.info(f'Processing measurement for {measurement.gateId}')
-        
-        # Prepare features for ML model
-        ts = datetime.fromisoformat(measurement.ts.replace('Z', '+00:00'))
-        match_start = ts.replace(hour=18, minute=0, second=0, microsecond=0)
-        minutes_to_kickoff = (match_start - ts).total_seconds() / 60
+        stored, incoming = (datetime.fromisoformat(value.replace('Z', '+00:00')) for value in (stored_ts, ts))
+        if (stored.tzinfo is None) != (incoming.tzinfo is None):
+            stored, incoming = stored.replace(tzinfo=None), incoming.replace(tzinfo=None)
+        return stored >= incoming
+    except ValueError:
+        return stored_ts == ts
+
+
+def _already_stored(measurement: GateMeasurement) -> bool:
+    """
+    Check whether the gate entity already reflects this measurement or a newer one.
+    A queue copy that arrives after a later reading was stored must not run
+    inference again or overwrite the newer state.
+    """
+    pending = gate_state_writer.get_pending(measurement.stadiumId, measurement.gateId)
+    if pending is not None and _ts_at_least(pending.get("last_ts"), measurement.ts):
+        return True
+    
+    try:
+        table_client = storage_client.get_table_client(settings.TABLE_NAME_GATES)
+        entity = table_client.get_entity(measurement.stadiumId, measurement.gateId, select=["last_ts"])
+        return _ts_at_least(entity.get("last_ts"), measurement.ts)
+    except ResourceNotFoundError:
+        return False
+    except Exception as e:
+        logging.warning(f"Idempotency lookup failed, processing anyway: {str(e)}")
+        return False
+
+
+def _claim(measurement: GateMeasurement, source: str) -> bool:
+    """
+    Claim the idempotency key of a measurement; False if it is a duplicate delivery
+    
+    With write-behind the key is claimed before the state is flushed, so delivery
+    is at-most-once for the flush interval (see shared/gate_state_writer.py).
+    """
+    # Drop duplicates before running inference
+    if not idempotency_guard.claim(measurement_key(measurement)):
+        logging.info(f"Duplicate measurement dropped for {measurement.gateId} at {measurement.ts}")
+        return False
+    
+    # In hybrid mode the queue copy usually was already processed inline,
+    # possibly by another worker, so check the stored gate state too
+    if source == "queue" and get_processing_mode() == "hybrid" and _already_stored(measurement):
+        idempotency_guard.record_duplicate()
+        logging.info(f"Measurement for {measurement.gateId} at {measurement.ts} already stored or superseded, skipping")
+        return False
+    
+    return True
+
+
+def _store_gate_state(measurement: GateMeasurement, predicted_wait: float, model_version: str):
+    """Classify the predicted wait and save the gate state to Table Storage"""
+    # Fallback if model fails or returns negative
+    if predicted_wait < 0:
+        logging.warning("ML inference failed, using fallback rule.")
+        predicted_wait = (measurement.queueLength * measurement.avgProcessingTime) / 60
+        model_version = "fallback_rule"
         
-        # Prepare features with proper one-hot encoding for all gates
-        features = {
-            'hour_of_day': ts.hour,
-            'minute_of_hour': ts.minute,
-            'minutes_to_kickoff': minutes_to_kickoff,
-            'is_peak': 1 if -60 <= minutes_to_kickoff <= 0 else 0,
-            'queue_length': measurement.queueLength,
-            'processing_time': measurement.avgProcessingTime,
-            'capacity_utilization': 0.5,
-            'gate_G1': 1 if measurement.gateId == 'G1' else 0,
-            'gate_G2': 1 if measurement.gateId == 'G2' else 0,
-            'gate_G3': 1 if measurement.gateId == 'G3' else 0
-        }
+    state = "green"
+    if predicted_wait > 10:
+        state = "red"
+    elif predicted_wait > 5:
+        state = "yellow"
         
+    entity = {
+        "PartitionKey": measurement.stadiumId,
+        "RowKey": measurement.gateId,
+        "wait": float(predicted_wait),
+        "state": state,
+        "queueLength": measurement.queueLength,
+        "processingTime": measurement.avgProcessingTime,
+        "perMinuteCount": measurement.perMinuteCount,
+        "last_updated": datetime.utcnow().isoformat(),
+        "last_ts": measurement.ts,
+        "model_version": model_version
+    }
+    
+    # Save to Table Storage (write-behind: coalesced per gate, flushed in batches)
+    if settings.GATESTATUS_WRITE_BEHIND:
+        gate_state_writer.write(entity)
+    else:
+        table_client = storage_client.get_table_client(settings.TABLE_NAME_GATES)
+        table_client.upsert_entity(entity=entity)
+    
+    # Keep the flow/status snapshot current without a table read
+    stadium_snapshots.update_gate(entity)
+    
+    # Drop cached anomaly scores only when the gate moved to another bucket
+    from shared.ml.aws_anomaly_client import aws_client
+    aws_client.invalidate_if_changed(measurement.stadiumId, measurement.gateId, entity)
+    streaming_detector.update(measurement.stadiumId, measurement.gateId, entity)
+    activity_index.touch(measurement.stadiumId)
+    logging.info(f"Updated status for {measurement.gateId}: {state} ({predicted_wait:.2f} min)")
+
+
+def _process_rows(measurements: List[GateMeasurement], source: str) -> Tuple[int, list]:
+    """
+    De-duplicate, run one batched inference over all new measurements and store results
+    
+    Returns:
+        (number processed, list of (measurement, exception) for failed rows)
+    """
+    rows = [m for m in measurements if _claim(m, source)]
+    if not rows:
+        return 0, []
+    
+    errors = []
+    failed = set()  # indices of rows that could not be encoded
+    predictions = [-1.0] * len(rows)
+    try:
         # ML Inference (lazy-loaded)
         from shared.ml.onnx_inference import get_inference_engine
         inference_engine = get_inference_engine()
-        predicted_wait = inference_engine.predict(features)
+        model_version = inference_engine.version
         
-        # Fallback if model fails or returns negative
-        if predicted_wait < 0:
-            logging.warning("ML inference failed, using fallback rule.")
-            predicted_wait = (measurement.queueLength * measurement.avgProcessingTime) / 60
-            
-        state = "green"
-        if predicted_wait > 10:
-            state = "red"
-        elif predicted_wait > 5:
-            state = "yellow"
-            
-        # Save to Table Storage
-        table_client = storage_client.get_table_client(settings.TABLE_NAME_GATES)
-        entity = {
-            "PartitionKey": measurement.stadiumId,
-            "RowKey": measurement.gateId,
-            "wait": float(predicted_wait),
-            "state": state,
-            "queueLength": measurement.queueLength,
-            "processingTime": measurement.avgProcessingTime,
-            "last_updated": datetime.utcnow().isoformat(),
-            "model_version": "1.0"
-        }
-        table_client.upsert_entity(entity=entity)
-        logging.info(f"Updated status for {measurement.gateId}: {state} ({predicted_wait:.2f} min)")
+        # Gates without a one-hot column in the model use the fallback rule
+        # instead of being scored with an all-zero gate vector
+        known = [i for i, m in enumerate(rows) if inference_engine.encoder.knows_gate(m.gateId)]
         
+        if len(known) == 1 and settings.INFERENCE_MICRO_BATCHING:
+            # Single rows go through the micro-batcher so concurrent requests share a call
+            from shared.ml.micro_batcher import get_micro_batcher
+            predictions[known[0]], model_version = get_micro_batcher().predict_with_version(rows[known[0]])
+        elif known:
+            # One session.run for all rows, encoded straight into a float32 matrix;
+            # a row that cannot be encoded fails alone
+            matrix, encoded, encode_errors = inference_engine.encoder.encode_rows([rows[i] for i in known])
+            for position, e in encode_errors:
+                failed.add(known[position])
+                idempotency_guard.release(measurement_key(rows[known[position]]))
+                errors.append((rows[known[position]], e))
+            if encoded:
+                for position, prediction in zip(encoded, inference_engine.predict_batch(matrix)):
+                    predictions[known[position]] = float(prediction)
     except Exception as e:
-        logging.error(f"Error processing measurement: {str(e)}")
-        raise e
+        for m in rows:
+            idempotency_guard.release(measurement_key(m))
+        return 0, [(m, e) for m in rows]
+    
+    processed = 0
+    for i, (measurement, predicted_wait) in enumerate(zip(rows, predictions)):
+        if i in failed:
+            continue
+        try:
+            _store_gate_state(measurement, predicted_wait, model_version or "unknown")
+            processed += 1
+        except Exception as e:
+            # Allow a retry (e.g. queue redelivery) to process it again
+            idempotency_guard.release(measurement_key(measurement))
+            errors.append((measurement, e))
+    
+    return processed, errors
+
+
+def process_measurement_sync(measurement: GateMeasurement, source: str = "http") -> bool:
+    """
+    Synchronous processing function that can be called directly
+    
+    Args:
+        measurement: Validated gate measurement
+        source: "http" for the ingest path, "queue" for the queue trigger
+    
+    Returns:
+        True if processed, False if dropped as a duplicate delivery
+    """
+    logging.info(f'Processing measurement for {measurement.gateId}')
+    processed, errors = _process_rows([measurement], source)
+    if errors:
+        logging.error(f"Error processing measurement: {str(errors[0][1])}")
+        raise errors[0][1]
+    return processed > 0
+
+
+def process_measurements_sync(measurements: List[GateMeasurement], source: str = "http") -> int:
+    """
+    Batch variant of process_measurement_sync with a single ONNX call for all rows
+    
+    Returns:
+        Number of measurements processed (duplicates are skipped)
+    
+    Raises:
+        BatchProcessingError if any row failed; successful rows stay stored
+    """
+    logging.info(f'Processing batch of {len(measurements)} measurements')
+    processed, errors = _process_rows(measurements, source)
+    for measurement, e in errors:
+        logging.error(f"Error processing measurement for {measurement.gateId}: {str(e)}")
+    if errors:
+        raise BatchProcessingError(f"{len(errors)}/{len(measurements)} measurements failed in batch", errors)
+    return processed
 
 @process_queue_bp.queue_trigger(arg_name="msg", queue_name="gates-inflow", connection="AzureWebJobsStorage")
 def process_gate_queue(msg: func.QueueMessage) -> None:
@@ -74,8 +242,22 @@ def process_gate_queue(msg: func.QueueMessage) -> None:
         logging.info('=== QUEUE PROCESSOR STARTED ===')
         logging.info('Processing queue item: %s', msg.get_body().decode('utf-8'))
         body = json.loads(msg.get_body().decode('utf-8'))
+        
+        # Batch messages from flow/ingest/batch carry several measurements
+        if "measurements" in body:
+            # An invalid row can never succeed, so drop it rather than retry the message
+            measurements = []
+            for item in body["measurements"]:
+                try:
+                    measurements.append(GateMeasurement(**item))
+                except ValueError as e:
+                    logging.error(f"Dropping invalid measurement from batch message: {str(e)}")
+            if measurements:
+                process_measurements_sync(measurements, source="queue")
+            return
+        
         measurement = GateMeasurement(**body)
-        process_measurement_sync(measurement)
+        process_measurement_sync(measurement, source="queue")
     except Exception as e:
         logging.error(f"Error processing queue item: {str(e)}")
         raise e
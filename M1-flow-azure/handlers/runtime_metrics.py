@@ -0,0 +1,68 @@
+"""
+Runtime Metrics API - HTTP endpoint exposing in-process performance counters
+"""
+import azure.functions as func
+import logging
+import json
+from datetime import datetime
+from shared.storage_client import storage_client
+from shared.idempotency import idempotency_guard
+from shared.gate_state_writer import gate_state_writer
+from shared.stadium_snapshot import stadium_snapshots
+from shared.activity_index import activity_index
+from ai_engine.root_cause.investigation_jobs import investigation_jobs
+from shared.ml.aws_anomaly_client import aws_client
+from shared.ml.streaming_detector import streaming_detector
+from shared.ml.micro_batcher import peek_micro_batcher
+from shared.ml.model_registry import model_registry
+from shared.openai_client import openai_client
+from ai_engine.root_cause.hypothesis_generator import hypothesis_generator
+from ai_engine.root_cause.anomaly_investigator import anomaly_investigator
+
+runtime_metrics_bp = func.Blueprint()
+
+@runtime_metrics_bp.route(route="flow/metrics", auth_level=func.AuthLevel.ANONYMOUS, methods=["GET"])
+def runtime_metrics(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Get performance counters of this worker
+    
+    Returns:
+        JSON with storage client reuse, de-duplication and other hot-path counters.
+        Counters are per worker process and reset on restart.
+    """
+    logging.info('Runtime metrics API called')
+    
+    try:
+        response_data = {
+            "storage": storage_client.get_stats(),
+            "ingest": {
+                "duplicates_dropped": idempotency_guard.duplicates_dropped
+            },
+            "gatestatus_writes": gate_state_writer.get_stats(),
+            "status_snapshots": stadium_snapshots.get_stats(),
+            "stadium_activity": activity_index.get_stats(),
+            "investigation_jobs": investigation_jobs.get_stats(),
+            "anomaly_cache": aws_client.cache.get_stats(),
+            "sagemaker_breaker": aws_client.breaker.get_stats(),
+            "openai_cache": openai_client.cache.get_stats(),
+            "hypothesis_cache": hypothesis_generator.cache.get_stats(),
+            "rca_investigations": anomaly_investigator.get_stats(),
+            "streaming_detector": streaming_detector.get_stats(),
+            "inference_model": model_registry.get_stats(),
+            "inference_batching": peek_micro_batcher().get_stats() if peek_micro_batcher() else None,
+            "query_time": datetime.utcnow().isoformat()
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response_data, indent=2),
+            status_code=200,
+            mimetype="application/json"
+        )
+    
+    except Exception as e:
+        logging.error(f"Error in runtime metrics: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -52,7 +52,7 @@ def train_and_export():
     
     # 6. Save Metadata
     metadata = {
-        "version": "1.0",
+        "version": os.environ.get("MODEL_VERSION", "1.0"),  # Bump to roll out via the model registry
         "created_at": pd.Timestamp.now().isoformat(),
         "metrics": {"rmse": rmse, "r2": r2},
         "features": features
@@ -0,0 +1,101 @@
+"""
+Activity Index - Which stadiums received gate data recently
+
+process_measurement_sync records a last-write watermark per stadium in
+memory and, at most once per ACTIVITY_HEARTBEAT_SECONDS, merges it into a
+single heartbeat row (one property per stadium). Readers get all stadiums
+with one point read instead of scanning gatestatus.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from azure.data.tables import UpdateMode
+from azure.core.exceptions import ResourceNotFoundError
+from shared.storage_client import storage_client
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_PARTITION = "activity"
+HEARTBEAT_ROW = "stadiums"
+PROPERTY_PREFIX = "s_"
+
+
+def _property_name(stadium_id: str) -> str:
+    # Table property names only allow identifier characters, so hex-encode the ID
+    return PROPERTY_PREFIX + stadium_id.encode().hex()
+
+
+def _stadium_id(property_name: str) -> str:
+    return bytes.fromhex(property_name[len(PROPERTY_PREFIX):]).decode()
+
+
+class ActivityIndex:
+    """Last gate write per stadium, kept in memory and in one heartbeat row"""
+    
+    def __init__(self, table_name: str, heartbeat_seconds: int):
+        self.table_name = table_name
+        self.heartbeat_seconds = heartbeat_seconds
+        self._last_write: Dict[str, datetime] = {}
+        self._last_heartbeat: Dict[str, float] = {}  # monotonic time of the last heartbeat write
+        self._lock = threading.Lock()
+        self.stats = {"touches": 0, "heartbeats_written": 0, "heartbeat_failures": 0}
+    
+    def touch(self, stadium_id: str):
+        """Record a gate write for a stadium"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats["touches"] += 1
+            self._last_write[stadium_id] = datetime.now(timezone.utc)
+            if now - self._last_heartbeat.get(stadium_id, float("-inf")) < self.heartbeat_seconds:
+                return
+            self._last_heartbeat[stadium_id] = now
+        
+        try:
+            # Merge touches only this stadium's property, so workers never overwrite each other
+            table_client = storage_client.get_table_client(self.table_name)
+            table_client.upsert_entity({
+                "PartitionKey": HEARTBEAT_PARTITION,
+                "RowKey": HEARTBEAT_ROW,
+                _property_name(stadium_id): datetime.now(timezone.utc)
+            }, mode=UpdateMode.MERGE)
+            self.stats["heartbeats_written"] += 1
+        except Exception as e:
+            with self._lock:
+                self._last_heartbeat.pop(stadium_id, None)
+                self.stats["heartbeat_failures"] += 1
+            logger.warning(f"Failed to write activity heartbeat for {stadium_id}: {str(e)}")
+    
+    def active_stadiums(self, window_minutes: int = 10) -> List[str]:
+        """
+        Stadiums with gate writes in the last window_minutes
+        
+        Returns:
+            Sorted stadium IDs from the heartbeat row and this worker's watermark
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=window_minutes)
+        with self._lock:
+            last_write = dict(self._last_write)
+        
+        try:
+            table_client = storage_client.get_table_client(self.table_name)
+            entity = table_client.get_entity(HEARTBEAT_PARTITION, HEARTBEAT_ROW)
+            for name, value in entity.items():
+                if name.startswith(PROPERTY_PREFIX) and isinstance(value, datetime):
+                    stadium_id = _stadium_id(name)
+                    if stadium_id not in last_write or value > last_write[stadium_id]:
+                        last_write[stadium_id] = value
+        except ResourceNotFoundError:
+            pass
+        
+        return sorted(stadium_id for stadium_id, ts in last_write.items() if ts >= cutoff)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "stadiums_seen": len(self._last_write)}
+
+
+# Global index instance
+activity_index = ActivityIndex(settings.TABLE_NAME_ACTIVITY, settings.ACTIVITY_HEARTBEAT_SECONDS)
@@ -0,0 +1,98 @@
+"""
+Circuit Breaker - Stops calling a failing dependency and probes it for recovery
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict
+from shared.metrics import Histogram
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `window_size` calls. Once at least
+    `min_calls` were made and the failure rate reaches `failure_rate_threshold`
+    the breaker opens and allow() returns False for `open_seconds`. After that
+    up to `half_open_max_calls` probe calls are let through; a success closes
+    the breaker, a failure opens it again.
+    """
+    
+    def __init__(self, name: str, failure_rate_threshold: float, window_size: int, min_calls: int,
+                 open_seconds: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window_size)  # True = failure
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        
+        self.latency_ms = Histogram([10, 25, 50, 100, 250, 500, 1000, 2000, 5000])
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+    
+    def allow(self) -> bool:
+        """Whether a call may be made now (counts a rejection if not)"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.stats["rejected"] += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+            
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    self.stats["rejected"] += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+    
+    def record_success(self, latency_ms: float):
+        self.latency_ms.observe(latency_ms)
+        with self._lock:
+            self.stats["calls"] += 1
+            if self.state == HALF_OPEN:
+                # Probe succeeded: start over with a clean window
+                self.state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(False)
+    
+    def record_failure(self, latency_ms: float):
+        self.latency_ms.observe(latency_ms)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += 1
+            self._outcomes.append(True)
+            
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            
+            if len(self._outcomes) >= self.min_calls:
+                failure_rate = sum(self._outcomes) / len(self._outcomes)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._open()
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            failure_rate = sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+            return {
+                "name": self.name,
+                "state": self.state,
+                "failure_rate": round(failure_rate, 3),
+                **self.stats,
+                "latency_ms": self.latency_ms.snapshot()
+            }
+    
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.stats["opened"] += 1
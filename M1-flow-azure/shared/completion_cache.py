@@ -0,0 +1,154 @@
+"""
+Completion Cache - Reuses chat completions for identical requests
+
+Two tiers: an in-memory LRU (shared/ttl_cache.TTLCache) and an optional
+Table Storage tier shared by all workers. Keys are a canonical hash of
+(model, messages, functions, temperature, max_tokens).
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError
+from shared.storage_client import storage_client
+from shared.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Table Storage string properties are limited to 64KB (32K UTF-16 characters)
+MAX_TABLE_RESPONSE_CHARS = 30000
+
+
+def completion_key(model: str, messages: List[Dict], functions: Optional[List[Dict]],
+                   temperature: float, max_tokens: Optional[int]) -> str:
+    """Canonical hash of everything that determines a completion"""
+    canonical = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "functions": functions,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CompletionCache:
+    """Memory tier in front of an optional Table Storage tier"""
+    
+    def __init__(self, max_entries: int, default_ttl_seconds: int, table_name: Optional[str] = None):
+        self.default_ttl_seconds = default_ttl_seconds
+        self.table_name = table_name
+        self._memory = TTLCache(max_entries, default_ttl_seconds)
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "table_hits": 0,
+            "misses": 0,
+            "expired_rows_deleted": 0,
+            "saved_tokens": 0,
+            "saved_cost_usd": 0.0
+        }
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response dict, or None"""
+        response = self._memory.get(key)
+        if response is None and self.table_name:
+            response = self._get_from_table(key)
+            if response is not None:
+                with self._lock:
+                    self.stats["table_hits"] += 1
+                # Promote to memory for the rest of the entry's lifetime
+                self._memory.set(key, response, ttl_seconds=response.pop("_ttl_left", None))
+        
+        with self._lock:
+            if response is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+        return response
+    
+    def set(self, key: str, response: Dict[str, Any], ttl_seconds: Optional[int] = None):
+        ttl = ttl_seconds or self.default_ttl_seconds
+        self._memory.set(key, response, ttl_seconds=ttl)
+        if self.table_name:
+            self._put_to_table(key, response, ttl)
+    
+    def record_saving(self, tokens: int, cost_usd: float):
+        """Account for an API call avoided by a hit"""
+        with self._lock:
+            self.stats["saved_tokens"] += tokens
+            self.stats["saved_cost_usd"] += cost_usd
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "saved_cost_usd": round(self.stats["saved_cost_usd"], 4),
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None,
+                "memory": self._memory.get_stats(),
+                "table_tier": bool(self.table_name)
+            }
+    
+    def _get_from_table(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            table_client = storage_client.get_table_client(self.table_name)
+            entity = table_client.get_entity(key[:2], key)
+        except ResourceNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Completion cache table read failed: {str(e)}")
+            return None
+        
+        ttl_left = (entity["expires_at"] - datetime.now(timezone.utc)).total_seconds()
+        if ttl_left <= 0:
+            self._delete_expired(entity)
+            return None
+        response = json.loads(entity["response"])
+        if response.get("function_call"):
+            response["function_call"] = SimpleNamespace(**response["function_call"])
+        response["_ttl_left"] = ttl_left
+        return response
+    
+    def _delete_expired(self, entity):
+        """Remove an expired row, unless it was refreshed since it was read"""
+        try:
+            table_client = storage_client.get_table_client(self.table_name)
+            table_client.delete_entity(
+                entity["PartitionKey"],
+                entity["RowKey"],
+                etag=entity.metadata["etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+            with self._lock:
+                self.stats["expired_rows_deleted"] += 1
+        except Exception as e:
+            logger.debug(f"Expired completion cache row not deleted: {str(e)}")
+    
+    def _put_to_table(self, key: str, response: Dict[str, Any], ttl_seconds: int):
+        function_call = response.get("function_call")
+        if function_call is not None and not isinstance(function_call, dict):
+            function_call = {"name": function_call.name, "arguments": function_call.arguments}
+        body = json.dumps({**response, "function_call": function_call})
+        if len(body) > MAX_TABLE_RESPONSE_CHARS:
+            return
+        
+        try:
+            table_client = storage_client.get_table_client(self.table_name)
+            table_client.upsert_entity({
+                "PartitionKey": key[:2],
+                "RowKey": key,
+                "response": body,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+            })
+        except Exception as e:
+            logger.warning(f"Completion cache table write failed: {str(e)}")
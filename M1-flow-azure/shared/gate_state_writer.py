@@ -0,0 +1,199 @@
+"""
+Gate State Writer - Write-behind, coalescing buffer for gatestatus upserts
+
+Only the newest state of a gate matters, so writes for the same
+(stadium, gate) between two flushes overwrite each other in memory. A
+background thread flushes every GATESTATUS_FLUSH_INTERVAL_MS using Table
+batch transactions grouped by PartitionKey (stadium).
+
+Staleness bound: while storage is healthy, a write reaches the table at most
+one flush interval (plus the flush itself) after it was buffered. Pending
+states are flushed on shutdown.
+
+A failed transaction is retried entity by entity, so one rejected entity does
+not hold back the rest of its partition. An entity that still fails is kept
+for the next flush and dropped (and logged) after GATESTATUS_MAX_WRITE_ATTEMPTS.
+
+Delivery: the ingest path claims a measurement's idempotency key before its
+state is flushed, so a crash between buffering and flushing loses that state
+and the redelivered message is skipped as a duplicate. This at-most-once
+window (one flush interval) is accepted because the next measurement of the
+gate supersedes the lost one.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+from config.settings import settings
+from shared.storage_client import storage_client
+
+logger = logging.getLogger(__name__)
+
+# Azure Table transactions accept at most 100 operations on one partition
+MAX_TRANSACTION_SIZE = 100
+
+
+class GateStateWriter:
+    """Keeps the latest entity per (PartitionKey, RowKey) and flushes them in batches"""
+    
+    def __init__(self, table_name: str, flush_interval_ms: int, max_pending: int, max_attempts: int):
+        self.table_name = table_name
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._attempts: Dict[Tuple[str, str], int] = {}  # failed flushes of the pending state
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {
+            "writes_received": 0,
+            "writes_coalesced": 0,
+            "entities_flushed": 0,
+            "transactions": 0,
+            "flush_errors": 0,
+            "entities_dropped": 0,
+            "last_flush_ms": None
+        }
+    
+    def write(self, entity: dict):
+        """Buffer the latest state of a gate"""
+        key = (entity["PartitionKey"], entity["RowKey"])
+        with self._lock:
+            self.stats["writes_received"] += 1
+            if key in self._pending:
+                self.stats["writes_coalesced"] += 1
+            self._pending[key] = entity
+            self._attempts.pop(key, None)
+            pending_count = len(self._pending)
+        
+        self._ensure_started()
+        if pending_count >= self.max_pending:
+            self._wakeup.set()
+    
+    def get_pending(self, partition_key: str, row_key: str) -> Optional[dict]:
+        """Buffered (not yet flushed) state of a gate, for read-your-writes"""
+        with self._lock:
+            return self._pending.get((partition_key, row_key))
+    
+    def flush(self) -> int:
+        """
+        Write all buffered states to Table Storage
+        
+        Returns:
+            Number of entities written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            
+            start = time.perf_counter()
+            table_client = storage_client.get_table_client(self.table_name)
+            
+            by_partition = defaultdict(list)
+            for entity in batch.values():
+                by_partition[entity["PartitionKey"]].append(entity)
+            
+            written = 0
+            for entities in by_partition.values():
+                for i in range(0, len(entities), MAX_TRANSACTION_SIZE):
+                    chunk = entities[i:i + MAX_TRANSACTION_SIZE]
+                    try:
+                        table_client.submit_transaction([("upsert", entity) for entity in chunk])
+                        self.stats["transactions"] += 1
+                        written += len(chunk)
+                        self._clear_attempts(chunk)
+                    except Exception as e:
+                        self.stats["flush_errors"] += 1
+                        logger.error(f"Gate state transaction failed for {len(chunk)} entities, retrying individually: {str(e)}")
+                        written += self._write_individually(table_client, chunk)
+            
+            self.stats["entities_flushed"] += written
+            self.stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            return written
+    
+    def close(self):
+        """Flush pending states (registered to run on shutdown)"""
+        try:
+            flushed = self.flush()
+            if flushed:
+                logger.info(f"Flushed {flushed} pending gate states on shutdown")
+        except Exception as e:
+            logger.error(f"Failed to flush gate states on shutdown: {str(e)}")
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending)}
+    
+    def _write_individually(self, table_client, entities: list) -> int:
+        """
+        Upsert entities one by one after a failed transaction
+        
+        Returns:
+            Number of entities written
+        """
+        written, failed = 0, []
+        for entity in entities:
+            try:
+                table_client.upsert_entity(entity=entity)
+                written += 1
+                self._clear_attempts([entity])
+            except Exception as e:
+                logger.warning(f"Gate state upsert failed for {entity['PartitionKey']}/{entity['RowKey']}: {str(e)}")
+                failed.append(entity)
+        if failed:
+            self._requeue(failed)
+        return written
+    
+    def _clear_attempts(self, entities: list):
+        with self._lock:
+            for entity in entities:
+                self._attempts.pop((entity["PartitionKey"], entity["RowKey"]), None)
+    
+    def _requeue(self, entities: list):
+        """Put failed entities back unless a newer state arrived meanwhile or they ran out of attempts"""
+        with self._lock:
+            for entity in entities:
+                key = (entity["PartitionKey"], entity["RowKey"])
+                if key in self._pending:
+                    continue
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(key, None)
+                    self.stats["entities_dropped"] += 1
+                    logger.error(f"Dropping gate state for {key[0]}/{key[1]} after {attempts} failed writes")
+                    continue
+                self._attempts[key] = attempts
+                self._pending[key] = entity
+    
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="gatestatus-write-behind", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Gate state flush loop error: {str(e)}")
+
+
+# Global writer instance
+gate_state_writer = GateStateWriter(
+    settings.TABLE_NAME_GATES,
+    settings.GATESTATUS_FLUSH_INTERVAL_MS,
+    settings.GATESTATUS_MAX_PENDING,
+    settings.GATESTATUS_MAX_WRITE_ATTEMPTS
+)
+atexit.register(gate_state_writer.close)
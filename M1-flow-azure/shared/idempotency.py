@@ -0,0 +1,61 @@
+"""
+Idempotency Guard - Drops duplicate deliveries of the same gate measurement
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Tuple
+from config.settings import settings
+
+
+def measurement_key(measurement) -> Tuple[str, str, str]:
+    """Idempotency key of a measurement: (stadium, gate, ts)"""
+    return (measurement.stadiumId, measurement.gateId, measurement.ts)
+
+
+class IdempotencyGuard:
+    """
+    Remembers recently processed keys for a bounded time window.
+    Oldest keys are evicted first once max_keys is reached.
+    """
+    
+    def __init__(self, max_keys: int, ttl_seconds: int):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicates_dropped = 0
+    
+    def claim(self, key: Hashable) -> bool:
+        """
+        Mark a key as being processed
+        
+        Returns:
+            True if the key is new, False if it was already seen (duplicate)
+        """
+        now = time.monotonic()
+        with self._lock:
+            seen_at = self._keys.get(key)
+            if seen_at is not None and now - seen_at < self.ttl_seconds:
+                self.duplicates_dropped += 1
+                return False
+            
+            self._keys[key] = now
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+            return True
+    
+    def record_duplicate(self):
+        """Count a duplicate detected outside the guard (e.g. from stored state)"""
+        with self._lock:
+            self.duplicates_dropped += 1
+    
+    def release(self, key: Hashable):
+        """Forget a key so a failed measurement can be retried"""
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+# Global guard shared by the HTTP and queue paths of this worker
+idempotency_guard = IdempotencyGuard(settings.IDEMPOTENCY_MAX_KEYS, settings.IDEMPOTENCY_TTL_SECONDS)
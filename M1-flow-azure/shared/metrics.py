@@ -0,0 +1,42 @@
+"""
+Lightweight in-process metrics used by the hot paths (no external dependency)
+"""
+import threading
+from typing import Dict, Iterable
+
+
+class Histogram:
+    """Fixed-bucket histogram; each bucket counts observations <= its upper bound"""
+    
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        with self._lock:
+            index = len(self.bounds)
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+    
+    def snapshot(self) -> Dict:
+        """Bucket counts plus count/mean/max, JSON serialisable"""
+        with self._lock:
+            buckets = {f"<={bound:g}": self.counts[i] for i, bound in enumerate(self.bounds)}
+            buckets["+Inf"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "mean": round(self.total / self.count, 4) if self.count else 0.0,
+                "max": round(self.max, 4),
+                "buckets": buckets
+            }
@@ -2,15 +2,28 @@ import boto3
 import json
 import logging
 import random
-from datetime import datetime, timedelta
+import threading
+import time
+from botocore.config import Config
+from typing import List, Tuple
 from config.settings import settings
+from shared.ttl_cache import TTLCache
+from shared.circuit_breaker import CircuitBreaker
 
 class AWSAnomalyClient:
     def __init__(self):
         self.client = None
         self.endpoint_name = settings.SAGEMAKER_ENDPOINT_NAME
-        self.cache = {}
-        self.cache_ttl = timedelta(minutes=5)
+        self.cache = TTLCache(settings.ANOMALY_CACHE_MAX_ENTRIES, settings.ANOMALY_CACHE_TTL_SECONDS)
+        self._gate_buckets = {}  # (stadium, gate) -> cache key of the last written state
+        self._gate_buckets_lock = threading.Lock()
+        self.breaker = CircuitBreaker(
+            "sagemaker",
+            failure_rate_threshold=settings.SAGEMAKER_BREAKER_FAILURE_RATE,
+            window_size=settings.SAGEMAKER_BREAKER_WINDOW,
+            min_calls=settings.SAGEMAKER_BREAKER_MIN_CALLS,
+            open_seconds=settings.SAGEMAKER_BREAKER_OPEN_SECONDS
+        )
         
         # Initialize boto3 client if credentials exist
         if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
@@ -19,7 +32,12 @@ class AWSAnomalyClient:
                     'sagemaker-runtime',
                     region_name=settings.AWS_REGION,
                     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    config=Config(
+                        connect_timeout=settings.SAGEMAKER_CONNECT_TIMEOUT_SECONDS,
+                        read_timeout=settings.SAGEMAKER_READ_TIMEOUT_SECONDS,
+                        retries={"max_attempts": settings.SAGEMAKER_MAX_ATTEMPTS, "mode": "standard"}
+                    )
                 )
             except Exception as e:
                 logging.warning(f"Failed to initialize AWS client: {e}")
@@ -31,46 +49,126 @@ class AWSAnomalyClient:
         Checks if the given data point is anomalous.
         Uses local cache to avoid frequent calls for similar data/time windows.
         """
-        gate_id = data_point.get('gateId')
-        
+        return self.check_anomalies([data_point])[0]
+
+    def check_anomalies(self, data_points: List[dict]) -> List[dict]:
+        """
+        Checks several data points, sending all uncached ones in as few
+        invoke_endpoint calls as possible (one CSV record per data point).
+        Results are returned in the order of data_points.
+        """
+        results = [None] * len(data_points)
+        misses = []
+
         # Check cache
-        if gate_id in self.cache:
-            entry = self.cache[gate_id]
-            if datetime.now() - entry['ts'] < self.cache_ttl:
-                return entry['result']
+        for i, data_point in enumerate(data_points):
+            cached = self.cache.get(self._cache_key(data_point))
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append(i)
 
-        result = {"anomaly": False, "score": 0.0}
+        if not misses:
+            return results
 
-        if self.client and self.endpoint_name:
-            try:
-                # Real call to SageMaker
-                payload = json.dumps(data_point)
-                response = self.client.invoke_endpoint(
-                    EndpointName=self.endpoint_name,
-                    ContentType='application/json',
-                    Body=payload
+        chunk_size = max(1, settings.SAGEMAKER_MAX_RECORDS_PER_CALL)
+        for start in range(0, len(misses), chunk_size):
+            chunk = misses[start:start + chunk_size]
+            points = [data_points[i] for i in chunk]
+
+            cacheable = True
+            if self.client and self.endpoint_name:
+                if self.breaker.allow():
+                    started = time.perf_counter()
+                    try:
+                        # Real call to SageMaker
+                        scores = self._invoke_endpoint(points)
+                        self.breaker.record_success((time.perf_counter() - started) * 1000)
+                        chunk_results = [
+                            {
+                                "anomaly": score > 3.0, # Threshold
+                                "score": score
+                            }
+                            for score in scores
+                        ]
+                    except Exception as e:
+                        self.breaker.record_failure((time.perf_counter() - started) * 1000)
+                        logging.error(f"SageMaker invocation failed: {e}")
+                        # Fallback to mock in case of error
+                        chunk_results = [self._mock_anomaly(point) for point in points]
+                        cacheable = False
+                else:
+                    # Breaker open: skip the call instead of waiting for timeouts
+                    chunk_results = [self._mock_anomaly(point) for point in points]
+                    cacheable = False
+            else:
+                # Mock mode
+                chunk_results = [self._mock_anomaly(point) for point in points]
+
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+
+            # Update cache in bulk (fallback scores are not cached so recovery is picked up at once)
+            if not cacheable:
+                continue
+            for i, result in zip(chunk, chunk_results):
+                stadium_id = data_points[i].get('stadiumId')
+                self.cache.set(
+                    self._cache_key(data_points[i]),
+                    result,
+                    ttl_seconds=settings.ANOMALY_CACHE_STADIUM_TTL_SECONDS.get(stadium_id),
+                    group=(stadium_id, data_points[i].get('gateId'))
                 )
-                result_body = json.loads(response['Body'].read().decode())
-                # Assuming RCF returns {"scores": [{"score": 1.2}]}
-                score = result_body['scores'][0]['score']
-                result = {
-                    "anomaly": score > 3.0, # Threshold
-                    "score": score
-                }
-            except Exception as e:
-                logging.error(f"SageMaker invocation failed: {e}")
-                # Fallback to mock in case of error
-                result = self._mock_anomaly(data_point)
-        else:
-            # Mock mode
-            result = self._mock_anomaly(data_point)
 
-        # Update cache
-        self.cache[gate_id] = {
-            'ts': datetime.now(),
-            'result': result
-        }
-        return result
+        return results
+
+    def invalidate_gate(self, stadium_id: str, gate_id: str):
+        """Drop cached scores of a gate after its state changed"""
+        self.cache.invalidate_group((stadium_id, gate_id))
+
+    def invalidate_if_changed(self, stadium_id: str, gate_id: str, gate_state: dict):
+        """
+        Drop cached scores of a gate only if its quantised state changed.
+        Writes within the same bucket keep the cache warm; the TTL bounds staleness.
+        """
+        key = self._cache_key({**gate_state, "stadiumId": stadium_id, "gateId": gate_id})
+        with self._gate_buckets_lock:
+            previous = self._gate_buckets.get((stadium_id, gate_id))
+            self._gate_buckets[(stadium_id, gate_id)] = key
+        if previous is not None and previous != key:
+            self.invalidate_gate(stadium_id, gate_id)
+
+    def _cache_key(self, data_point: dict) -> Tuple:
+        """(stadium, gate, quantised metrics) - similar readings share a score"""
+        return (
+            data_point.get('stadiumId'),
+            data_point.get('gateId'),
+            int(data_point.get('queueLength', 0) // settings.ANOMALY_CACHE_QUEUE_BUCKET),
+            int(data_point.get('wait', 0) // settings.ANOMALY_CACHE_WAIT_BUCKET),
+            int(data_point.get('processingTime', 0) // settings.ANOMALY_CACHE_PROCESSING_BUCKET)
+        )
+
+    def _invoke_endpoint(self, data_points: List[dict]) -> List[float]:
+        """
+        Scores data points in a single request.
+        Random Cut Forest takes one CSV record per line and returns
+        {"scores": [{"score": 1.2}, ...]} in the same order.
+        """
+        payload = "\n".join(
+            f"{point.get('wait', 0)},{point.get('queueLength', 0)},{point.get('processingTime', 0)}"
+            for point in data_points
+        )
+        response = self.client.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            ContentType='text/csv',
+            Accept='application/json',
+            Body=payload
+        )
+        result_body = json.loads(response['Body'].read().decode())
+        scores = [item['score'] for item in result_body['scores']]
+        if len(scores) != len(data_points):
+            raise ValueError(f"Expected {len(data_points)} scores, got {len(scores)}")
+        return scores
 
     def _mock_anomaly(self, data_point: dict) -> dict:
         """
@@ -0,0 +1,128 @@
+"""
+Feature Encoder - Compiled mapping from GateMeasurement fields to model input columns
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GATE_FEATURE_PREFIX = "gate_"
+KICKOFF_MINUTE_OF_DAY = 18 * 60  # Assume 18:00 kickoff, as in training data
+DEFAULT_CAPACITY_UTILIZATION = 0.5
+
+
+class FeatureEncoder:
+    """
+    Built once from model_metadata.json["features"]. Resolves every feature name
+    to a column index up front, so encoding a measurement writes straight into a
+    float32 row without building per-request dicts or lists.
+    Gate one-hot columns are discovered from `gate_<id>` names, for any number of gates.
+    """
+    
+    def __init__(self, features: Sequence[str]):
+        self.features = list(features)
+        self.width = len(self.features)
+        index = {name: i for i, name in enumerate(self.features)}
+        
+        self._hour = index.get("hour_of_day")
+        self._minute = index.get("minute_of_hour")
+        self._to_kickoff = index.get("minutes_to_kickoff")
+        self._is_peak = index.get("is_peak")
+        self._queue_length = index.get("queue_length")
+        self._processing_time = index.get("processing_time")
+        self._capacity = index.get("capacity_utilization")
+        self.gate_columns = {
+            name[len(GATE_FEATURE_PREFIX):]: i
+            for name, i in index.items()
+            if name.startswith(GATE_FEATURE_PREFIX)
+        }
+        
+        self._lock = threading.Lock()
+        self.unknown_gates = set()
+        self.unknown_gate_rows = 0
+    
+    def knows_gate(self, gate_id: str) -> bool:
+        """
+        Whether the model has a one-hot column for this gate. Unknown gates would
+        otherwise be encoded as an all-zero gate vector; they are logged once.
+        """
+        if not self.gate_columns or gate_id in self.gate_columns:
+            return True
+        with self._lock:
+            self.unknown_gate_rows += 1
+            if gate_id not in self.unknown_gates:
+                self.unknown_gates.add(gate_id)
+                logger.warning(f"Gate {gate_id} has no one-hot column in the model (known: {sorted(self.gate_columns)})")
+        return False
+    
+    def encode_into(self, row: np.ndarray, measurement) -> np.ndarray:
+        """Fill a preallocated float32 row of length `width` from a GateMeasurement"""
+        ts = datetime.fromisoformat(measurement.ts.replace('Z', '+00:00'))
+        minute_of_day = ts.hour * 60 + ts.minute + ts.second / 60 + ts.microsecond / 60000000
+        minutes_to_kickoff = KICKOFF_MINUTE_OF_DAY - minute_of_day
+        
+        row.fill(0.0)
+        if self._hour is not None:
+            row[self._hour] = ts.hour
+        if self._minute is not None:
+            row[self._minute] = ts.minute
+        if self._to_kickoff is not None:
+            row[self._to_kickoff] = minutes_to_kickoff
+        if self._is_peak is not None:
+            row[self._is_peak] = 1.0 if -60 <= minutes_to_kickoff <= 0 else 0.0
+        if self._queue_length is not None:
+            row[self._queue_length] = measurement.queueLength
+        if self._processing_time is not None:
+            row[self._processing_time] = measurement.avgProcessingTime
+        if self._capacity is not None:
+            row[self._capacity] = DEFAULT_CAPACITY_UTILIZATION
+        
+        gate_column = self.gate_columns.get(measurement.gateId)
+        if gate_column is not None:
+            row[gate_column] = 1.0
+        return row
+    
+    def encode_batch(self, measurements: List, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode N measurements into an (N, width) float32 matrix.
+        If `out` is given (at least N rows), it is filled in place and a view is returned.
+        """
+        n = len(measurements)
+        if out is None:
+            out = np.empty((n, self.width), dtype=np.float32)
+        matrix = out[:n]
+        for i, measurement in enumerate(measurements):
+            self.encode_into(matrix[i], measurement)
+        return matrix
+    
+    def encode_rows(self, measurements: List, out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[int], List[Tuple[int, Exception]]]:
+        """
+        Like encode_batch, but a measurement that cannot be encoded is skipped
+        instead of failing the others
+        
+        Returns:
+            (matrix of the encoded rows, their indices in `measurements`,
+             list of (index, exception) for rows that failed)
+        """
+        n = len(measurements)
+        if out is None:
+            out = np.empty((n, self.width), dtype=np.float32)
+        encoded, errors = [], []
+        for i, measurement in enumerate(measurements):
+            try:
+                self.encode_into(out[len(encoded)], measurement)
+                encoded.append(i)
+            except Exception as e:
+                errors.append((i, e))
+        return out[:len(encoded)], encoded, errors
+    
+    def get_stats(self) -> dict:
+        return {
+            "width": self.width,
+            "gates": sorted(self.gate_columns),
+            "unknown_gates": sorted(self.unknown_gates),
+            "unknown_gate_rows": self.unknown_gate_rows
+        }
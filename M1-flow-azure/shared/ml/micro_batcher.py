@@ -0,0 +1,161 @@
+"""
+Inference Micro-Batcher - Coalesces concurrent single-row predictions into one ONNX call
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, Tuple
+import numpy as np
+from config.settings import settings
+from shared.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceMicroBatcher:
+    """
+    Collects predict requests from any thread for up to `window_ms` (or until
+    `max_rows` are queued), runs them as a single predict_batch call on a
+    background thread and hands each caller its own result.
+    """
+    
+    def __init__(self, engine_provider: Callable, window_ms: float, max_rows: int, timeout_seconds: float):
+        self.engine_provider = engine_provider
+        self.window_seconds = window_ms / 1000.0
+        self.max_rows = max(1, max_rows)
+        self.timeout_seconds = timeout_seconds
+        
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._buffer: Optional[np.ndarray] = None
+        
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_delay_ms = Histogram([0.1, 0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.batches_run = 0
+        self.rows_predicted = 0
+        self.timeouts = 0
+    
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="inference-micro-batcher", daemon=True)
+                    self._thread.start()
+    
+    def submit(self, measurement) -> Future:
+        """Queue one GateMeasurement; the future resolves to (predicted wait, model version)"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((time.perf_counter(), measurement, future))
+        return future
+    
+    def predict(self, measurement) -> float:
+        """Blocking predict through the batcher (-1.0 on timeout, like a model failure)"""
+        return self.predict_with_version(measurement)[0]
+    
+    def predict_with_version(self, measurement) -> Tuple[float, Optional[str]]:
+        """Blocking predict returning the version of the model that produced it"""
+        try:
+            return self.submit(measurement).result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            logger.error("Micro-batched inference timed out")
+            return -1.0, None
+    
+    async def predict_async(self, measurement) -> float:
+        """Asyncio-friendly predict; does not block the event loop while batching"""
+        prediction, _ = await asyncio.wrap_future(self.submit(measurement))
+        return prediction
+    
+    def _collect(self) -> list:
+        """Block for the first request, then gather more until the window closes or the batch is full"""
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[0] + self.window_seconds
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched_at = time.perf_counter()
+            
+            try:
+                engine = self.engine_provider()
+                measurements = [measurement for _, measurement, _ in batch]
+                
+                # Encode straight into one reused float32 buffer (this thread only);
+                # a hot-swapped model may change the width
+                width = engine.encoder.width
+                if self._buffer is None or self._buffer.shape[1] != width:
+                    self._buffer = np.empty((self.max_rows, width), dtype=np.float32)
+                matrix, encoded, encode_errors = engine.encoder.encode_rows(measurements, out=self._buffer)
+                
+                # A malformed measurement fails only its own caller
+                for i, e in encode_errors:
+                    logger.warning(f"Micro-batch row could not be encoded: {str(e)}")
+                    batch[i][2].set_exception(e)
+                
+                if encoded:
+                    predictions = engine.predict_batch(matrix)
+                    for i, prediction in zip(encoded, predictions):
+                        batch[i][2].set_result((float(prediction), engine.version))
+            except Exception as e:
+                logger.error(f"Micro-batch inference failed: {str(e)}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            
+            self.batches_run += 1
+            self.rows_predicted += len(batch)
+            self.batch_sizes.observe(len(batch))
+            for enqueued_at, _, _ in batch:
+                self.queue_delay_ms.observe((dispatched_at - enqueued_at) * 1000)
+    
+    def get_stats(self) -> dict:
+        """Batch-size and queueing-delay histograms for tuning window/max_rows"""
+        return {
+            "window_ms": self.window_seconds * 1000,
+            "max_rows": self.max_rows,
+            "batches_run": self.batches_run,
+            "rows_predicted": self.rows_predicted,
+            "timeouts": self.timeouts,
+            "pending": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_delay_ms": self.queue_delay_ms.snapshot()
+        }
+
+
+# Lazy-loading singleton, shares the engine returned by get_inference_engine()
+_micro_batcher = None
+_micro_batcher_lock = threading.Lock()
+
+def get_micro_batcher() -> InferenceMicroBatcher:
+    global _micro_batcher
+    if _micro_batcher is None:
+        with _micro_batcher_lock:
+            if _micro_batcher is None:
+                from shared.ml.onnx_inference import get_inference_engine
+                _micro_batcher = InferenceMicroBatcher(
+                    engine_provider=get_inference_engine,
+                    window_ms=settings.INFERENCE_BATCH_WINDOW_MS,
+                    max_rows=settings.INFERENCE_BATCH_MAX_ROWS,
+                    timeout_seconds=settings.INFERENCE_BATCH_TIMEOUT_SECONDS
+                )
+    return _micro_batcher
+
+def peek_micro_batcher() -> Optional[InferenceMicroBatcher]:
+    """Return the batcher if it was created, without creating it"""
+    return _micro_batcher
@@ -0,0 +1,167 @@
+"""
+Model Registry - Loads versioned wait-time models and hot-swaps them without a restart
+
+Sources:
+    local - MODEL_LOCAL_DIR (defaults to shared/ml/models) holding MODEL_FILENAME
+            and model_metadata.json
+    blob  - BLOB_CONTAINER_MODELS container laid out as:
+                model_metadata.json              (current version pointer)
+                {version}/MODEL_FILENAME
+                {version}/model_metadata.json
+"""
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+from datetime import datetime
+from typing import Optional
+from config.settings import settings
+from shared.storage_client import storage_client
+from shared.ml.onnx_inference import ONNXInference
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILENAME = "model_metadata.json"
+
+
+class ModelRegistry:
+    """
+    Keeps the active ONNXInference engine keyed by the `version` in model_metadata.json.
+    A background thread polls for a new version, loads and warms it up off the hot
+    path, then swaps the reference atomically. Requests that already hold the old
+    engine finish on it; new requests get the new one.
+    """
+    
+    def __init__(self):
+        self.source = settings.MODEL_SOURCE.lower()
+        self.local_dir = settings.MODEL_LOCAL_DIR or str(pathlib.Path(__file__).parent / "models")
+        self.cache_dir = settings.MODEL_CACHE_DIR or os.path.join(tempfile.gettempdir(), "fanops-models")
+        self.refresh_interval = settings.MODEL_REFRESH_INTERVAL_SECONDS
+        
+        self._engine: Optional[ONNXInference] = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self.stats = {
+            "source": self.source,
+            "version": None,
+            "loaded_at": None,
+            "reloads": 0,
+            "failed_reloads": 0
+        }
+    
+    def current(self) -> ONNXInference:
+        """Active engine; loads the latest model on first use"""
+        engine = self._engine
+        if engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._load_latest()
+                    self._record_swap(self._engine)
+                    self._start_refresher()
+                engine = self._engine
+        return engine
+    
+    def peek(self) -> Optional[ONNXInference]:
+        """Active engine if loaded, without loading it"""
+        return self._engine
+    
+    def refresh(self) -> bool:
+        """
+        Load the latest model if its version differs from the active one
+        
+        Returns:
+            True if a new model was swapped in
+        """
+        metadata = self._read_latest_metadata()
+        version = str(metadata.get("version", "unknown"))
+        active = self._engine
+        if active is not None and active.version == version:
+            return False
+        
+        logger.info(f"New wait-time model version {version} found (active: {active.version if active else None})")
+        engine = ONNXInference(self._materialise(version))
+        if engine.session is None:
+            self.stats["failed_reloads"] += 1
+            logger.error(f"Model version {version} failed to load, keeping {active.version if active else None}")
+            return False
+        
+        # Single reference assignment: in-flight requests keep the engine they hold
+        with self._lock:
+            self._engine = engine
+            self._record_swap(engine)
+            self.stats["reloads"] += 1
+        logger.info(f"Wait-time model swapped to version {engine.version}")
+        return True
+    
+    def get_stats(self) -> dict:
+        engine = self._engine
+        return {
+            **self.stats,
+            "load": engine.load_stats if engine else None,
+            "features": engine.encoder.get_stats() if engine else None
+        }
+    
+    def _record_swap(self, engine: ONNXInference):
+        self.stats["version"] = engine.version
+        self.stats["loaded_at"] = datetime.utcnow().isoformat()
+    
+    def _load_latest(self) -> ONNXInference:
+        try:
+            version = str(self._read_latest_metadata().get("version", "unknown"))
+            return ONNXInference(self._materialise(version))
+        except Exception as e:
+            # Fall back to the model shipped with the app
+            logger.error(f"Failed to load model from {self.source} registry: {str(e)}")
+            return ONNXInference(os.path.join(self.local_dir, settings.MODEL_FILENAME))
+    
+    def _read_latest_metadata(self) -> dict:
+        if self.source == "blob":
+            blob = storage_client.get_blob_client(settings.BLOB_CONTAINER_MODELS, METADATA_FILENAME)
+            return json.loads(blob.download_blob().readall())
+        
+        with open(os.path.join(self.local_dir, METADATA_FILENAME), "r") as f:
+            return json.load(f)
+    
+    def _materialise(self, version: str) -> str:
+        """Return a local model path for the version, downloading it if needed"""
+        if self.source != "blob":
+            return os.path.join(self.local_dir, settings.MODEL_FILENAME)
+        
+        version_dir = os.path.join(self.cache_dir, version)
+        model_path = os.path.join(version_dir, settings.MODEL_FILENAME)
+        if os.path.exists(model_path):
+            return model_path
+        
+        os.makedirs(version_dir, exist_ok=True)
+        for name in (METADATA_FILENAME, settings.MODEL_FILENAME):
+            blob = storage_client.get_blob_client(settings.BLOB_CONTAINER_MODELS, f"{version}/{name}")
+            data = blob.download_blob().readall()
+            
+            # Write then rename so a half-downloaded file is never loaded
+            tmp_path = os.path.join(version_dir, f".{name}.part")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(version_dir, name))
+        
+        logger.info(f"Downloaded model version {version} to {version_dir}")
+        return model_path
+    
+    def _start_refresher(self):
+        if self.refresh_interval <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name="model-registry-refresh", daemon=True)
+        self._refresh_thread.start()
+    
+    def _refresh_loop(self):
+        stop = threading.Event()
+        while not stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats["failed_reloads"] += 1
+                logger.warning(f"Model registry refresh failed: {str(e)}")
+
+# Global registry instance
+model_registry = ModelRegistry()
@@ -3,6 +3,18 @@ import numpy as np
 import os
 import logging
 import json
+import tempfile
+import time
+from typing import List, Optional, Union
+from config.settings import settings
+from shared.ml.feature_encoder import FeatureEncoder
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
 
 class ONNXInference:
     def __init__(self, model_path: str):
@@ -10,8 +22,47 @@ class ONNXInference:
         self.session = None
         self.input_name = None
         self.features = []
+        self.version = "unknown"
+        self.encoder = FeatureEncoder([])
+        self.load_stats = {
+            "cold_start_ms": None,
+            "warmup_ms": None,
+            "first_request_ms": None,
+            "optimized_model_cache": "disabled"
+        }
         self._load_model()
         self._load_metadata()
+        if settings.ONNX_WARMUP_ON_LOAD:
+            self._warm_up()
+
+    def _session_options(self) -> ort.SessionOptions:
+        """Session profile from settings (0 threads = onnxruntime default)"""
+        options = ort.SessionOptions()
+        if settings.ONNX_INTRA_OP_THREADS > 0:
+            options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+        if settings.ONNX_INTER_OP_THREADS > 0:
+            options.inter_op_num_threads = settings.ONNX_INTER_OP_THREADS
+        options.graph_optimization_level = _GRAPH_OPTIMIZATION_LEVELS.get(
+            settings.ONNX_GRAPH_OPTIMIZATION_LEVEL.lower(),
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        options.enable_cpu_mem_arena = settings.ONNX_ENABLE_MEM_ARENA
+        options.enable_mem_pattern = settings.ONNX_ENABLE_MEM_PATTERN
+        return options
+
+    def _optimized_model_path(self) -> Optional[str]:
+        """
+        Location of the optimised model for this machine. Keyed by the source
+        model's size, mtime and optimisation level so a new model is re-optimised.
+        """
+        if not settings.ONNX_OPTIMIZED_MODEL_CACHE:
+            return None
+        stat = os.stat(self.model_path)
+        cache_dir = settings.ONNX_OPTIMIZED_MODEL_DIR or os.path.join(tempfile.gettempdir(), "fanops-onnx")
+        os.makedirs(cache_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(self.model_path))[0]
+        level = settings.ONNX_GRAPH_OPTIMIZATION_LEVEL.lower()
+        return os.path.join(cache_dir, f"{name}.{stat.st_size}.{int(stat.st_mtime)}.{level}.opt.onnx")
 
     def _load_model(self):
         try:
@@ -19,12 +70,74 @@ class ONNXInference:
                 logging.warning(f"ONNX model not found at {self.model_path}. Inference will fail.")
                 return
             
-            self.session = ort.InferenceSession(self.model_path)
+            start = time.perf_counter()
+            load_path = self.model_path
+            
+            try:
+                optimized_path = self._optimized_model_path()
+            except OSError as e:
+                logging.warning(f"Optimized model cache unavailable: {str(e)}")
+                optimized_path = None
+            
+            session = None
+            if optimized_path and os.path.exists(optimized_path):
+                session = self._load_optimized(optimized_path)
+                if session:
+                    load_path = optimized_path
+                    self.load_stats["optimized_model_cache"] = "hit"
+            
+            if session is None:
+                options = self._session_options()
+                temp_path = None
+                if optimized_path:
+                    # Written under a private name and renamed, so concurrent loads never see a partial file
+                    temp_path = f"{optimized_path}.{os.getpid()}.tmp"
+                    options.optimized_model_filepath = temp_path
+                session = ort.InferenceSession(self.model_path, sess_options=options)
+                if temp_path:
+                    self._publish_optimized(temp_path, optimized_path)
+            
+            self.session = session
             self.input_name = self.session.get_inputs()[0].name
-            logging.info(f"Loaded ONNX model from {self.model_path}")
+            self.load_stats["cold_start_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            logging.info(
+                f"Loaded ONNX model from {load_path} in {self.load_stats['cold_start_ms']}ms "
+                f"(optimized cache: {self.load_stats['optimized_model_cache']})"
+            )
         except Exception as e:
             logging.error(f"Failed to load ONNX model: {str(e)}")
 
+    def _load_optimized(self, optimized_path: str):
+        """
+        Session from a cached optimised model, None if it cannot be loaded.
+        An unloadable (e.g. truncated) cache file is deleted so it is rebuilt.
+        """
+        options = self._session_options()
+        # Already optimised on an earlier load, skip graph optimisation
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(optimized_path, sess_options=options)
+        except Exception as e:
+            logging.warning(f"Discarding unusable optimized model {optimized_path}: {str(e)}")
+            self.load_stats["optimized_model_cache"] = "corrupt"
+            try:
+                os.remove(optimized_path)
+            except OSError:
+                pass
+            return None
+
+    def _publish_optimized(self, temp_path: str, optimized_path: str):
+        """Atomically move a freshly written optimised model into the cache"""
+        try:
+            os.replace(temp_path, optimized_path)
+            self.load_stats["optimized_model_cache"] = "written"
+        except OSError as e:
+            logging.warning(f"Could not cache optimized model: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
     def _load_metadata(self):
         try:
             metadata_path = os.path.join(os.path.dirname(self.model_path), "model_metadata.json")
@@ -32,41 +145,84 @@ class ONNXInference:
                 with open(metadata_path, 'r') as f:
                     data = json.load(f)
                     self.features = data.get("features", [])
+                    self.version = str(data.get("version", "unknown"))
+                    self.encoder = FeatureEncoder(self.features)
         except Exception as e:
             logging.warning(f"Failed to load model metadata: {str(e)}")
 
+    def _warm_up(self):
+        """
+        Run synthetic inferences so graph setup and memory-arena allocation
+        happen at load time instead of on the first real measurement
+        """
+        if not self.session or not self.features:
+            return
+        try:
+            start = time.perf_counter()
+            width = len(self.features)
+            for rows in {1, max(1, settings.INFERENCE_BATCH_MAX_ROWS)}:
+                self.session.run(None, {self.input_name: np.zeros((rows, width), dtype=np.float32)})
+            self.load_stats["warmup_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            logging.info(f"ONNX model warm-up completed in {self.load_stats['warmup_ms']}ms")
+        except Exception as e:
+            logging.warning(f"ONNX model warm-up failed: {str(e)}")
+
     def predict(self, input_data: dict) -> float:
         """
         Runs inference on a single dictionary of input features.
         Expected keys in input_data must match training features.
         """
-        if not self.session:
-            return -1.0
+        return float(self.predict_batch([input_data])[0])
+
+    def build_matrix(self, rows: List[dict], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Builds a (N, len(features)) float32 matrix from feature dicts.
+        Missing features default to 0.0 (safe fallback). If `out` is given
+        (a preallocated buffer with at least N rows), it is filled in place.
+        """
+        n = len(rows)
+        if out is None:
+            out = np.empty((n, len(self.features)), dtype=np.float32)
+        matrix = out[:n]
+        for i, row in enumerate(rows):
+            matrix[i] = [row.get(f, 0.0) for f in self.features]
+        return matrix
+
+    def predict_batch(self, inputs: Union[List[dict], np.ndarray]) -> np.ndarray:
+        """
+        Runs inference over N rows with a single session.run call.
+        
+        Args:
+            inputs: List of feature dicts, or a float32 matrix of shape
+                (N, len(features)) with columns in self.features order
+        
+        Returns:
+            float32 array of N predictions (-1.0 for every row on failure)
+        """
+        n = inputs.shape[0] if isinstance(inputs, np.ndarray) else len(inputs)
+        if not self.session or n == 0:
+            return np.full(n, -1.0, dtype=np.float32)
         
         try:
-            # Prepare input vector in correct order
-            # Default to 0.0 if feature missing (safe fallback)
-            input_vector = [float(input_data.get(f, 0.0)) for f in self.features]
-            
-            # Reshape to (1, N)
-            input_tensor = np.array(input_vector, dtype=np.float32).reshape(1, -1)
+            if isinstance(inputs, np.ndarray):
+                input_tensor = np.ascontiguousarray(inputs, dtype=np.float32).reshape(n, -1)
+            else:
+                input_tensor = self.build_matrix(inputs)
             
-            # Run inference
+            # Run inference; the model has a dynamic (None) batch dimension
+            start = time.perf_counter()
             result = self.session.run(None, {self.input_name: input_tensor})
-            return float(result[0][0])
+            if self.load_stats["first_request_ms"] is None:
+                self.load_stats["first_request_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                logging.info(f"First ONNX inference took {self.load_stats['first_request_ms']}ms")
+            return np.asarray(result[0], dtype=np.float32).reshape(n)
         except Exception as e:
             logging.error(f"Inference error: {str(e)}")
-            return -1.0
-
+            return np.full(n, -1.0, dtype=np.float32)
 
-# Lazy-loading singleton pattern to avoid crashes during module import
-_inference_engine = None
 
-def get_inference_engine():
-    global _inference_engine
-    if _inference_engine is None:
-        import pathlib
-        current_dir = pathlib.Path(__file__).parent.parent.parent
-        model_path = current_dir / "shared" / "ml" / "models" / "wait_time_model.onnx"
-        _inference_engine = ONNXInference(str(model_path))
-    return _inference_engine
+# Engines are owned by the model registry, which loads (lazily, avoiding
+# crashes during module import) and hot-swaps versioned models
+def get_inference_engine() -> ONNXInference:
+    from shared.ml.model_registry import model_registry
+    return model_registry.current()
@@ -0,0 +1,138 @@
+"""
+Streaming Anomaly Detector - In-process alternative to the SageMaker endpoint
+Keeps a robust EWMA baseline per gate, updated from every ingested measurement
+
+Baselines live in process memory. A worker that only serves flow/status (queue
+mode, or several instances) never sees the ingest writes, so scored data points
+that carry a measurement timestamp (last_ts) not yet folded in are learned from
+as well. Such a worker seeds and updates its baselines at the rate it reads
+gate state (STATUS_SNAPSHOT_MAX_AGE_SECONDS), so warm-up takes longer there.
+"""
+import logging
+import threading
+from typing import Dict, List
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Data point fields scored by the detector
+FEATURES = ("queueLength", "wait", "processingTime", "perMinuteCount")
+
+# Scales a mean absolute deviation to a standard deviation for normal data
+MAD_TO_STD = 1.2533
+
+
+class _GateBaseline:
+    """EWMA mean and mean absolute deviation per feature (O(1) memory)"""
+    
+    __slots__ = ("mean", "mad", "samples", "last_ts")
+    
+    def __init__(self, values: List[float], last_ts=None):
+        self.mean = list(values)
+        self.mad = [0.0] * len(values)
+        self.samples = 1
+        self.last_ts = last_ts  # measurement timestamp of the last folded data point
+
+
+class StreamingAnomalyDetector:
+    """
+    Scores a data point by its largest robust z-score across FEATURES.
+    Updates are clipped to `clip` deviations, so a burst of outliers moves
+    the baseline slowly instead of hiding itself.
+    """
+    
+    def __init__(self, alpha: float, threshold: float, warmup_samples: int, clip: float = 3.0):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup_samples = warmup_samples
+        self.clip = clip
+        self._baselines: Dict[tuple, _GateBaseline] = {}
+        self._lock = threading.Lock()
+        self.stats = {"updates": 0, "scored": 0, "unknown_gates": 0, "learned_on_read": 0}
+    
+    def update(self, stadium_id: str, gate_id: str, data_point: dict):
+        """Fold one measurement of a gate into its baseline"""
+        values = [float(data_point.get(feature) or 0) for feature in FEATURES]
+        with self._lock:
+            self._fold((stadium_id, gate_id), values, data_point.get("last_ts"))
+    
+    def _fold(self, key: tuple, values: List[float], last_ts) -> bool:
+        """Update a baseline (caller holds the lock); False if this measurement was already folded"""
+        baseline = self._baselines.get(key)
+        if baseline is not None and last_ts is not None and baseline.last_ts == last_ts:
+            return False
+        
+        self.stats["updates"] += 1
+        if baseline is None:
+            self._baselines[key] = _GateBaseline(values, last_ts)
+            return True
+        
+        for i, value in enumerate(values):
+            deviation = value - baseline.mean[i]
+            limit = self.clip * self._scale(baseline, i)
+            if baseline.samples >= self.warmup_samples:
+                deviation = max(-limit, min(limit, deviation))
+            baseline.mean[i] += self.alpha * deviation
+            baseline.mad[i] += self.alpha * (abs(deviation) - baseline.mad[i])
+        baseline.samples += 1
+        baseline.last_ts = last_ts
+        return True
+    
+    def check_anomaly(self, data_point: dict) -> dict:
+        """
+        Same contract as AWSAnomalyClient.check_anomaly
+        
+        A data point with a last_ts not yet folded in is scored against the
+        current baseline first and then learned from (seeding unknown gates).
+        """
+        key = (data_point.get('stadiumId'), data_point.get('gateId'))
+        values = [float(data_point.get(feature) or 0) for feature in FEATURES]
+        last_ts = data_point.get('last_ts')
+        with self._lock:
+            self.stats["scored"] += 1
+            baseline = self._baselines.get(key)
+            if baseline is None:
+                self.stats["unknown_gates"] += 1
+                if last_ts is not None and self._fold(key, values, last_ts):
+                    self.stats["learned_on_read"] += 1
+                return {"anomaly": False, "score": 0.0}
+            
+            score = max(
+                abs(value - baseline.mean[i]) / self._scale(baseline, i)
+                for i, value in enumerate(values)
+            )
+            warmed_up = baseline.samples >= self.warmup_samples
+            if last_ts is not None and self._fold(key, values, last_ts):
+                self.stats["learned_on_read"] += 1
+        
+        return {
+            "anomaly": warmed_up and score > self.threshold,
+            "score": round(score, 2)
+        }
+    
+    def check_anomalies(self, data_points: List[dict]) -> List[dict]:
+        return [self.check_anomaly(data_point) for data_point in data_points]
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "gates": len(self._baselines)}
+    
+    def _scale(self, baseline: _GateBaseline, i: int) -> float:
+        # Floor relative to the mean keeps near-constant features from scoring huge
+        return max(MAD_TO_STD * baseline.mad[i], 0.05 * abs(baseline.mean[i]), 1e-3)
+
+
+# Global detector instance (fed by process_measurement_sync and by status reads)
+streaming_detector = StreamingAnomalyDetector(
+    alpha=settings.ANOMALY_LOCAL_ALPHA,
+    threshold=settings.ANOMALY_LOCAL_THRESHOLD,
+    warmup_samples=settings.ANOMALY_LOCAL_WARMUP_SAMPLES
+)
+
+
+def get_anomaly_detector():
+    """Detector selected by ANOMALY_DETECTOR: "local" or "sagemaker" (default)"""
+    if (settings.ANOMALY_DETECTOR or "").lower() == "local":
+        return streaming_detector
+    from shared.ml.aws_anomaly_client import aws_client
+    return aws_client
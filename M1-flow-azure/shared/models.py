@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -10,6 +10,14 @@ class GateMeasurement(BaseModel):
     avgProcessingTime: float
     queueLength: int
 
+    @field_validator("ts")
+    @classmethod
+    def _check_ts(cls, value: str) -> str:
+        # Parsed the same way as the feature encoder, so a bad timestamp is
+        # rejected with its row instead of failing a whole inference batch
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return value
+
 class GateStatus(BaseModel):
     stadiumId: str
     gateId: str
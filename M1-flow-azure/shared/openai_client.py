@@ -9,6 +9,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 import tiktoken
 from openai import OpenAI, OpenAIError
 from config.settings import settings
+from shared.completion_cache import CompletionCache, completion_key
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,13 @@ class OpenAIClient:
             self.encoding = tiktoken.encoding_for_model(self.model)
         except KeyError:
             self.encoding = tiktoken.get_encoding("cl100k_base")  # Fallback
+        
+        # Response cache (memory LRU, optionally backed by Table Storage)
+        self.cache = CompletionCache(
+            settings.OPENAI_CACHE_MAX_ENTRIES,
+            settings.OPENAI_CACHE_TTL_SECONDS,
+            table_name=settings.TABLE_NAME_COMPLETION_CACHE if settings.OPENAI_CACHE_TABLE_TIER else None
+        )
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in a text string"""
@@ -55,36 +63,69 @@ class OpenAIClient:
         
         return input_cost + output_cost
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type(OpenAIError),
-        reraise=True
-    )
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         functions: Optional[List[Dict]] = None,
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        cache: bool = True,
+        cache_ttl_seconds: Optional[int] = None
     ) -> Dict[str, Any]:
         """
-        Call OpenAI chat completion with retry logic
+        Call OpenAI chat completion with retry logic, served from cache when possible
         
         Args:
             messages: List of chat messages
             functions: Optional function definitions for function calling
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
+            cache: Set False for call sites whose answers must not be reused
+            cache_ttl_seconds: How long this call site's answers stay valid (default OPENAI_CACHE_TTL_SECONDS)
         
         Returns:
             Response dict with content, function_call, usage, and cost
+            (cost is 0.0 and cached is True for a cache hit)
         """
         if self.mock_mode:
             return self._mock_response(messages, functions)
         
         max_tokens = max_tokens or settings.OPENAI_MAX_TOKENS
         
+        use_cache = cache and settings.OPENAI_CACHE_ENABLED
+        if use_cache:
+            key = completion_key(self.model, messages, functions, temperature, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                usage = cached["usage"]
+                self.cache.record_saving(
+                    usage["total_tokens"],
+                    self.estimate_cost(usage["prompt_tokens"], usage["completion_tokens"])
+                )
+                logger.info("OpenAI call served from cache")
+                return {**cached, "cost": 0.0, "cached": True}
+        
+        response = self._create_completion(messages, functions, temperature, max_tokens)
+        
+        # Only complete answers are worth reusing
+        if use_cache and response["finish_reason"] in ("stop", "function_call"):
+            self.cache.set(key, response, ttl_seconds=cache_ttl_seconds)
+        return response
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type(OpenAIError),
+        reraise=True
+    )
+    def _create_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]],
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """Make the API call (retried on OpenAIError)"""
         try:
             # Build request parameters
             params = {
@@ -0,0 +1,137 @@
+"""
+Stadium Snapshot Cache - Materialised per-stadium gate state for flow/status
+
+process_measurement_sync pushes every gate write here, so status reads are
+served from memory. A snapshot is re-seeded from gatestatus once it is older
+than STATUS_SNAPSHOT_MAX_AGE_SECONDS, which bounds staleness for writes made
+by other workers.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+from config.settings import settings
+from shared.storage_client import storage_client
+
+# Gate fields that make up the served state (and the ETag)
+SNAPSHOT_FIELDS = ("wait", "state", "queueLength", "processingTime", "perMinuteCount", "last_ts")
+
+
+class StadiumSnapshot:
+    """Gate states of one stadium with a version counter and content ETag"""
+    
+    def __init__(self, stadium_id: str):
+        self.stadium_id = stadium_id
+        self.gates: Dict[str, dict] = {}
+        self.version = 0
+        self.etag = None
+        self.seeded_at = None  # monotonic time of the last table load
+    
+    def gates_since(self, since: Optional[int] = None) -> List[dict]:
+        """Gates changed after version `since` (all gates if None)"""
+        gates = self.gates.values()
+        if since is not None:
+            gates = [g for g in gates if g["version"] > since]
+        return sorted(gates, key=lambda g: g["gateId"])
+    
+    def copy(self) -> "StadiumSnapshot":
+        """Point-in-time copy; gate dicts are replaced on write, never mutated"""
+        snapshot = StadiumSnapshot(self.stadium_id)
+        snapshot.gates = dict(self.gates)
+        snapshot.version = self.version
+        snapshot.etag = self.etag
+        snapshot.seeded_at = self.seeded_at
+        return snapshot
+
+
+class StadiumSnapshotCache:
+    """In-process snapshots, updated on write and re-seeded from Table Storage when stale"""
+    
+    def __init__(self, max_age_seconds: int):
+        self.max_age_seconds = max_age_seconds
+        self._snapshots: Dict[str, StadiumSnapshot] = {}
+        self._lock = threading.Lock()
+        self._last_version = 0
+        self.stats = {"reads": 0, "seeds": 0, "updates": 0, "unknown": 0}
+    
+    def update_gate(self, entity: dict):
+        """Apply a gatestatus entity written by this worker"""
+        with self._lock:
+            snapshot = self._snapshot(entity["PartitionKey"])
+            self._apply(snapshot, entity["RowKey"], entity, str(entity.get("last_updated", "")))
+            self.stats["updates"] += 1
+    
+    def get(self, stadium_id: str) -> Optional[StadiumSnapshot]:
+        """
+        Snapshot for a stadium, loading it from gatestatus if missing or stale
+        
+        Returns:
+            Consistent copy of the snapshot, None if the stadium has no gates
+        """
+        with self._lock:
+            self.stats["reads"] += 1
+            snapshot = self._snapshots.get(stadium_id)
+            if snapshot and snapshot.seeded_at is not None and time.monotonic() - snapshot.seeded_at < self.max_age_seconds:
+                return snapshot.copy()
+        
+        # Table query outside the lock; apply only changed gates afterwards
+        table_client = storage_client.get_table_client(settings.TABLE_NAME_GATES)
+        entities = list(table_client.query_entities(f"PartitionKey eq '{stadium_id}'"))
+        
+        with self._lock:
+            # Unknown stadiums are not cached, so arbitrary ids cannot grow the map
+            if not entities and stadium_id not in self._snapshots:
+                self.stats["unknown"] += 1
+                return None
+            
+            snapshot = self._snapshot(stadium_id)
+            for entity in entities:
+                current = snapshot.gates.get(entity["RowKey"])
+                # Keep a local write that is newer than what the table returned
+                # (rows written before last_ts existed compare as "")
+                if current and (current.get("last_ts") or "") > (entity.get("last_ts") or ""):
+                    continue
+                self._apply(snapshot, entity["RowKey"], entity, str(entity.get("Timestamp", "")))
+            snapshot.seeded_at = time.monotonic()
+            self.stats["seeds"] += 1
+            return snapshot.copy()
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "stadiums": len(self._snapshots)}
+    
+    def _snapshot(self, stadium_id: str) -> StadiumSnapshot:
+        snapshot = self._snapshots.get(stadium_id)
+        if snapshot is None:
+            snapshot = self._snapshots[stadium_id] = StadiumSnapshot(stadium_id)
+        return snapshot
+    
+    def _next_version(self) -> int:
+        # Millisecond clock, strictly increasing within the process
+        self._last_version = max(self._last_version + 1, int(time.time() * 1000))
+        return self._last_version
+    
+    def _apply(self, snapshot: StadiumSnapshot, gate_id: str, entity: dict, last_updated: str):
+        """Update one gate; bump versions and ETag only if its state changed"""
+        state = {field: entity.get(field) for field in SNAPSHOT_FIELDS}
+        current = snapshot.gates.get(gate_id)
+        if current and all(current.get(field) == value for field, value in state.items()):
+            return
+        
+        version = self._next_version()
+        gate = {"gateId": gate_id, "last_updated": last_updated, "version": version, **state}
+        # Copy-on-write so readers iterating the previous dict are unaffected
+        snapshot.gates = {**snapshot.gates, gate_id: gate}
+        snapshot.version = version
+        
+        # Content hash, so every worker serving the same state returns the same ETag
+        content = json.dumps(
+            [[g["gateId"]] + [g.get(field) for field in SNAPSHOT_FIELDS] for g in snapshot.gates_since()],
+            default=str
+        )
+        snapshot.etag = '"' + hashlib.sha1(content.encode()).hexdigest() + '"'
+
+
+# Global cache instance
+stadium_snapshots = StadiumSnapshotCache(settings.STATUS_SNAPSHOT_MAX_AGE_SECONDS)
@@ -1,39 +1,170 @@
-from azure.data.tables import TableClient
-from azure.storage.queue import QueueClient
-from azure.storage.blob import BlobClient
+from azure.data.tables import TableClient, TableServiceClient
+from azure.storage.queue import QueueClient, QueueServiceClient
+from azure.storage.blob import BlobClient, BlobServiceClient, ContainerClient
 from azure.core.exceptions import ResourceExistsError
 from config.settings import settings
+from typing import Callable, Dict, List
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 class StorageClient:
+    """
+    Process-wide storage access.
+    Keeps one long-lived client per table, queue and container. Clients of the
+    same service share the service client's HTTP transport (connection pool),
+    and create_table/create_queue/create_container runs once per process.
+    """
+
     def __init__(self):
         self.conn_str = settings.STORAGE_CONNECTION_STRING
         if not self.conn_str:
             logger.warning("STORAGE_CONNECTION_STRING not set. Storage operations will fail.")
-        
-    def get_table_client(self, table_name: str) -> TableClient:
-        client = TableClient.from_connection_string(conn_str=self.conn_str, table_name=table_name)
+
+        self._lock = threading.RLock()
+        self._table_service = None
+        self._queue_service = None
+        self._blob_service = None
+        self._table_clients: Dict[str, TableClient] = {}
+        self._queue_clients: Dict[str, QueueClient] = {}
+        self._container_clients: Dict[str, ContainerClient] = {}
+        self._ensured = set()
+        self._resource_locks: Dict[tuple, threading.Lock] = {}
+        self.stats = {
+            "clients_created": 0,
+            "client_cache_hits": 0,
+            "create_calls": 0,
+            "create_calls_skipped": 0
+        }
+
+    # --- Service clients (own the shared transport) ---
+
+    def _get_table_service(self) -> TableServiceClient:
+        if self._table_service is None:
+            self._table_service = TableServiceClient.from_connection_string(conn_str=self.conn_str)
+        return self._table_service
+
+    def _get_queue_service(self) -> QueueServiceClient:
+        if self._queue_service is None:
+            self._queue_service = QueueServiceClient.from_connection_string(conn_str=self.conn_str)
+        return self._queue_service
+
+    def _get_blob_service(self) -> BlobServiceClient:
+        if self._blob_service is None:
+            self._blob_service = BlobServiceClient.from_connection_string(conn_str=self.conn_str)
+        return self._blob_service
+
+    def _ensure(self, kind: str, name: str, create: Callable[[], object]):
+        """Run a create_* call once per process for the given resource (caller holds its resource lock)"""
+        key = (kind, name)
+        if key in self._ensured:
+            with self._lock:
+                self.stats["create_calls_skipped"] += 1
+            return
+
+        with self._lock:
+            self.stats["create_calls"] += 1
         try:
-            client.create_table()
+            create()
         except ResourceExistsError:
             pass
-        return client
+        self._ensured.add(key)
+
+    def _get_client(self, kind: str, name: str, cache: Dict[str, object], factory: Callable[[], object], create_attr: str):
+        """
+        Cached client for a resource, creating the resource on first use
+
+        The create_* round trip runs under a per-resource lock only, so a slow
+        create does not block access to other, already cached resources.
+        """
+        with self._lock:
+            client = cache.get(name)
+            if client is not None:
+                self.stats["client_cache_hits"] += 1
+                self.stats["create_calls_skipped"] += 1
+                return client
+            resource_lock = self._resource_locks.setdefault((kind, name), threading.Lock())
+
+        with resource_lock:
+            with self._lock:
+                client = cache.get(name)
+                if client is not None:
+                    self.stats["client_cache_hits"] += 1
+                    return client
+                client = factory()
+                self.stats["clients_created"] += 1
+
+            self._ensure(kind, name, getattr(client, create_attr))
+
+            with self._lock:
+                cache[name] = client
+            return client
+
+    # --- Resource clients ---
+
+    def get_table_client(self, table_name: str) -> TableClient:
+        return self._get_client(
+            "table", table_name, self._table_clients,
+            lambda: self._get_table_service().get_table_client(table_name), "create_table"
+        )
 
     def get_queue_client(self, queue_name: str) -> QueueClient:
-        client = QueueClient.from_connection_string(conn_str=self.conn_str, queue_name=queue_name)
-        try:
-            client.create_queue()
-        except ResourceExistsError:
-            pass
-        return client
-        
-    def get_blob_client(self, container_name: str, blob_name: str) -> BlobClient:
-        return BlobClient.from_connection_string(
-            conn_str=self.conn_str, 
-            container_name=container_name, 
-            blob_name=blob_name
+        return self._get_client(
+            "queue", queue_name, self._queue_clients,
+            lambda: self._get_queue_service().get_queue_client(queue_name), "create_queue"
+        )
+
+    def get_container_client(self, container_name: str) -> ContainerClient:
+        return self._get_client(
+            "container", container_name, self._container_clients,
+            lambda: self._get_blob_service().get_container_client(container_name), "create_container"
         )
 
+    def get_blob_client(self, container_name: str, blob_name: str) -> BlobClient:
+        return self.get_container_client(container_name).get_blob_client(blob_name)
+
+    def ensure_resources(self) -> Dict[str, List[str]]:
+        """
+        Create all configured tables, queues and containers once at startup.
+        Failures are logged, not raised; the resource is retried on first use.
+
+        Returns:
+            Dict with the names of resources that are ready and those that failed
+        """
+        resources = [
+            (self.get_table_client, settings.TABLE_NAME_GATES),
+            (self.get_table_client, settings.TABLE_NAME_ACTIVITY),
+            (self.get_table_client, settings.TABLE_NAME_AI_DECISIONS),
+            (self.get_table_client, settings.TABLE_NAME_AGENT_MEMORY),
+            (self.get_table_client, settings.TABLE_NAME_INVESTIGATION_LOGS),
+            (self.get_queue_client, settings.QUEUE_NAME_INFLOW),
+            (self.get_queue_client, settings.QUEUE_NAME_CONTROL),
+            (self.get_queue_client, settings.QUEUE_NAME_INVESTIGATIONS),
+            (self.get_container_client, settings.BLOB_CONTAINER_MODELS),
+            (self.get_container_client, settings.BLOB_CONTAINER_DECISION_TRACES)
+        ]
+
+        result = {"ready": [], "failed": []}
+        for getter, name in resources:
+            try:
+                getter(name)
+                result["ready"].append(name)
+            except Exception as e:
+                logger.warning(f"Failed to ensure storage resource {name}: {str(e)}")
+                result["failed"].append(name)
+
+        logger.info(f"Storage resources ready: {len(result['ready'])}, failed: {len(result['failed'])}")
+        return result
+
+    def get_stats(self) -> Dict[str, int]:
+        """Client reuse counters; create_calls_skipped is the number of round trips saved"""
+        with self._lock:
+            return {
+                **self.stats,
+                "cached_tables": len(self._table_clients),
+                "cached_queues": len(self._queue_clients),
+                "cached_containers": len(self._container_clients)
+            }
+
 storage_client = StorageClient()
@@ -0,0 +1,93 @@
+"""
+TTL Cache - Bounded in-process cache with per-entry expiry and LRU eviction
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Maps keys to values for a limited time.
+    Least recently used entries are evicted once max_size is reached (or, if
+    `sizeof` is given, once the estimated size exceeds max_bytes). Entries
+    can be tagged with a group so that all of them can be invalidated at once.
+    """
+    
+    def __init__(self, max_size: int, default_ttl_seconds: float,
+                 max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_size = max_size
+        self.default_ttl_seconds = default_ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (expires_at, value, group, size)
+        self._groups: Dict[Hashable, set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: float = None, group: Hashable = None):
+        """Store a value; ttl_seconds defaults to the cache-wide TTL"""
+        ttl = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, group, size)
+            self._bytes += size
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            
+            while len(self._entries) > self.max_size or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1):
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+    
+    def invalidate_group(self, group: Hashable) -> int:
+        """Drop every entry stored with the given group; returns the number dropped"""
+        with self._lock:
+            keys = self._groups.get(group, ())
+            count = len(keys)
+            for key in list(keys):
+                self._remove(key)
+            self.stats["invalidations"] += count
+            return count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "bytes": self._bytes if self.sizeof else None,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None
+            }
+    
+    def _remove(self, key: Hashable):
+        _, _, group, size = self._entries.pop(key)
+        self._bytes -= size
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
@@ -0,0 +1,147 @@
+"""
+Test script for the ONNX wait-time inference engine
+Run this to verify batched inference matches single-row inference
+"""
+import logging
+import numpy as np
+from datetime import datetime
+from shared.models import GateMeasurement
+from shared.ml.onnx_inference import get_inference_engine
+from shared.ml.streaming_detector import StreamingAnomalyDetector
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+def _sample_features(n: int) -> list:
+    """Build n feature dicts covering all gates and a range of queue lengths"""
+    rows = []
+    for i in range(n):
+        minute = i % 60
+        rows.append({
+            "hour_of_day": 17,
+            "minute_of_hour": minute,
+            "minutes_to_kickoff": 60 - minute,
+            "is_peak": 0,
+            "queue_length": i * 3,
+            "processing_time": 3.0 + (i % 4),
+            "capacity_utilization": 0.5,
+            f"gate_G{i % 3 + 1}": 1
+        })
+    return rows
+
+def test_predict_batch():
+    """Test that predict_batch matches predict row by row"""
+    print("=" * 60)
+    print("TESTING BATCHED ONNX INFERENCE")
+    print("=" * 60)
+    
+    engine = get_inference_engine()
+    rows = _sample_features(64)
+    
+    single = np.array([engine.predict(r) for r in rows], dtype=np.float32)
+    batch = engine.predict_batch(rows)
+    matrix = engine.predict_batch(engine.build_matrix(rows))
+    
+    assert batch.shape == (64,), "Wrong batch output shape"
+    assert np.allclose(single, batch, atol=1e-5), "Batch predictions differ from single-row predictions"
+    assert np.allclose(batch, matrix, atol=1e-5), "Matrix input differs from dict input"
+    assert engine.predict_batch([]).shape == (0,), "Empty batch should return empty array"
+    
+    print(f"✓ {len(rows)} rows predicted in one call")
+    print(f"✓ First predictions: {batch[:3]}")
+    
+    return batch
+
+def test_feature_encoder():
+    """Test that the compiled encoder matches dict-based feature building"""
+    print("=" * 60)
+    print("TESTING FEATURE ENCODER")
+    print("=" * 60)
+    
+    engine = get_inference_engine()
+    encoder = engine.encoder
+    measurements = [
+        GateMeasurement(stadiumId="AGADIR", gateId=f"G{i % 3 + 1}", ts=f"2025-07-14T17:{i:02d}:30Z",
+                        perMinuteCount=20, avgProcessingTime=3.5 + i % 3, queueLength=i * 7)
+        for i in range(30)
+    ]
+    
+    matrix = encoder.encode_batch(measurements)
+    for row, m in zip(matrix, measurements):
+        ts = datetime.fromisoformat(m.ts.replace('Z', '+00:00'))
+        minutes_to_kickoff = (ts.replace(hour=18, minute=0, second=0) - ts).total_seconds() / 60
+        expected = {
+            "hour_of_day": ts.hour,
+            "minute_of_hour": ts.minute,
+            "minutes_to_kickoff": minutes_to_kickoff,
+            "is_peak": 1 if -60 <= minutes_to_kickoff <= 0 else 0,
+            "queue_length": m.queueLength,
+            "processing_time": m.avgProcessingTime,
+            "capacity_utilization": 0.5,
+            f"gate_{m.gateId}": 1
+        }
+        assert np.allclose(row, engine.build_matrix([expected])[0]), f"Encoding mismatch for {m.gateId} at {m.ts}"
+    
+    assert encoder.knows_gate("G2"), "G2 should have a one-hot column"
+    assert not encoder.knows_gate("G9"), "G9 should be reported as unknown"
+    assert "G9" in encoder.get_stats()["unknown_gates"], "Unknown gate not tracked"
+    
+    print(f"✓ {len(measurements)} measurements encoded, gates: {encoder.get_stats()['gates']}")
+    
+    return matrix
+
+def test_streaming_detector():
+    """Test that the local detector learns a baseline and flags a queue spike"""
+    print("=" * 60)
+    print("TESTING STREAMING ANOMALY DETECTOR")
+    print("=" * 60)
+    
+    detector = StreamingAnomalyDetector(alpha=0.05, threshold=3.0, warmup_samples=20)
+    for i in range(100):
+        detector.update("AGADIR", "G1", {
+            "queueLength": 40 + i % 5,
+            "wait": 5.0 + (i % 3) * 0.2,
+            "processingTime": 3.5,
+            "perMinuteCount": 30 + i % 4
+        })
+    
+    normal = detector.check_anomaly({"stadiumId": "AGADIR", "gateId": "G1", "queueLength": 42,
+                                     "wait": 5.2, "processingTime": 3.5, "perMinuteCount": 31})
+    spike = detector.check_anomaly({"stadiumId": "AGADIR", "gateId": "G1", "queueLength": 160,
+                                    "wait": 14.0, "processingTime": 3.5, "perMinuteCount": 31})
+    unknown = detector.check_anomaly({"stadiumId": "RABAT", "gateId": "G1", "queueLength": 160})
+    
+    assert not normal["anomaly"], f"Normal reading flagged: {normal}"
+    assert spike["anomaly"], f"Spike not flagged: {spike}"
+    assert not unknown["anomaly"], "Gate without a baseline must not be flagged"
+    
+    print(f"✓ Normal score: {normal['score']}, spike score: {spike['score']}")
+    
+    # A status-only worker never calls update(); it learns from the states it scores
+    reader = StreamingAnomalyDetector(alpha=0.05, threshold=3.0, warmup_samples=20)
+    for i in range(100):
+        reader.check_anomaly({"stadiumId": "AGADIR", "gateId": "G1", "queueLength": 40 + i % 5,
+                              "wait": 5.0 + (i % 3) * 0.2, "processingTime": 3.5,
+                              "perMinuteCount": 30 + i % 4, "last_ts": str(i)})
+        # Re-reading the same measurement must not count twice
+        reader.check_anomaly({"stadiumId": "AGADIR", "gateId": "G1", "queueLength": 40 + i % 5,
+                              "wait": 5.0 + (i % 3) * 0.2, "processingTime": 3.5,
+                              "perMinuteCount": 30 + i % 4, "last_ts": str(i)})
+    spike_read = reader.check_anomaly({"stadiumId": "AGADIR", "gateId": "G1", "queueLength": 160,
+                                       "wait": 14.0, "processingTime": 3.5, "perMinuteCount": 31,
+                                       "last_ts": "100"})
+    
+    assert reader.get_stats()["updates"] == 101, "Each measurement must be learned once"
+    assert spike_read["anomaly"], f"Spike not flagged from read-seeded baseline: {spike_read}"
+    
+    print(f"✓ Read-seeded spike score: {spike_read['score']}")
+    
+    return spike
+
+if __name__ == "__main__":
+    test_predict_batch()
+    test_feature_encoder()
+    test_streaming_detector()